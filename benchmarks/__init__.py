@@ -0,0 +1 @@
+"""Outils de mesure de performance du gestionnaire de tournoi (hors application)."""
@@ -0,0 +1,211 @@
+"""
+Banc de mesure du tournoi, à lancer avant un événement pour repérer les régressions.
+
+    python -m benchmarks.bench                       # grille complète
+    python -m benchmarks.bench --quick --no-pages    # fonctions du cœur, petites tailles
+    python -m benchmarks.bench --out ref.json        # enregistre une référence
+    python -m benchmarks.bench --baseline ref.json   # code retour 1 si une mesure régresse
+
+Chaque mesure est la médiane de plusieurs répétitions, en millisecondes :
+fonctions de `tournament_core` d'une part, rerun complet de chaque page de
+l'application (via `streamlit.testing.v1.AppTest`) d'autre part.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import APP_PATH, make_tournament, select_match
+from tournament_core import (
+    TIEBREAKERS, allocate_decks, bank_question, build_question_bank, build_roster, build_schedule, compute_match_points,
+    compute_standings, deck_position, match_points_matrix, new_manual_match, rank_teams, simulate_rankings,
+    standings_award, standings_tables, state_to_json, validate_manual_teams, validate_questions,
+)
+
+PAGES = ["Configuration & Sauvegarde", "Calendrier", "Matchs Manuels", "Console d'Arbitrage", "Classement Général"]
+
+# (équipes, matchs)
+FULL_GRID = [(9, 6), (50, 100), (200, 1000), (1000, 10000)]
+QUICK_GRID = [(9, 6), (50, 100)]
+# questions de la banque
+BANK_GRID = [1000, 100_000]
+
+
+def timed(fn, repeat=5):
+    """Médiane (ms) de `repeat` exécutions de `fn`."""
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def bench_core(state, repeat):
+    import pandas as pd
+
+    teams_df = pd.DataFrame(state["teams"])
+    roster = build_roster(teams_df)
+    matches = state["matches"]
+    finished = [m["scores"] for m in matches.values() if m["status"] == "Terminé"]
+    standings = compute_standings(roster["teams"], matches, state["player_scores"])
+    refs = dict(state, teams=teams_df, questions=pd.DataFrame(state["questions"]))
+    n_rounds = max(1, -(-len(matches) // max(1, len(roster["teams"]) // 3)))
+    players = list(roster["player_team"].items())[:1000]
+    pending = {mid: dict(m, status="Prévu") for mid, m in matches.items()}
+
+    def awards():
+        local = compute_standings(roster["teams"], {}, state["player_scores"])
+        scores = dict(state["player_scores"])
+        for p, t in players:
+            standings_award(local, t, p, scores[p], 1)
+            scores[p] += 1
+
+    return {
+        "build_roster": timed(lambda: build_roster(teams_df), repeat),
+        "compute_match_points (tous)": timed(lambda: [compute_match_points(s) for s in finished], repeat),
+        "match_points_matrix": timed(lambda: match_points_matrix(matches, roster["teams"]), repeat),
+        "rank_teams (tous départages)": timed(lambda: rank_teams(matches, roster["teams"], TIEBREAKERS), repeat),
+        "simulate_rankings (5000 tirages)": timed(lambda: simulate_rankings(
+            matches, state["match_progress"], roster["teams"], [q["Points"] for q in state["questions"]], 5000
+        ), repeat),
+        # aucun match terminé, matchs sans paquet, grande banque : la longueur ne doit pas suivre la banque
+        "simulate_rankings (0 terminé, banque 3000)": timed(lambda: simulate_rankings(
+            pending, state["match_progress"], roster["teams"], [i % 5 + 1 for i in range(3000)], 5000
+        ), repeat),
+        "compute_standings": timed(lambda: compute_standings(roster["teams"], matches, state["player_scores"]), repeat),
+        "standings_tables": timed(lambda: standings_tables(standings, roster), repeat),
+        "standings_award x1000": timed(awards, repeat),
+        "build_schedule": timed(lambda: build_schedule(len(roster["teams"]), n_rounds, seed=0), repeat),
+        "create_manual_match x100": timed(lambda: [
+            validate_manual_teams(roster["teams"][:3]) or new_manual_match(roster["teams"][:3], "", i)
+            for i in range(100)
+        ], repeat),
+        "export_state_json": timed(lambda: state_to_json(refs), repeat),
+    }
+
+
+def bench_bank(n_questions, repeat):
+    """Banque de questions : construction à l'import, paquets de 1000 matchs, lecture question par question."""
+    import pandas as pd
+
+    state = make_tournament(3, 1, n_questions=n_questions)
+    questions_df, _, _ = validate_questions(pd.DataFrame(state["questions"]))
+    bank = build_question_bank(questions_df)
+    rounds = bank["round_labels"][:2]
+
+    def decks():
+        fresh = dict(bank, pools={})
+        for deck in allocate_decks({}, 1000, 30, rounds, seed=0):
+            deck_position(fresh, deck, 0)
+
+    deck = allocate_decks({}, 1, 30, rounds, seed=0)[0]
+    return {
+        "build_question_bank": timed(lambda: build_question_bank(questions_df), repeat),
+        "paquets x1000 (tirage compris)": timed(decks, repeat),
+        "question suivante x1000": timed(lambda: [
+            bank_question(bank, deck_position(bank, deck, i % 30)) for i in range(1000)
+        ], repeat),
+    }
+
+
+def bench_pages(state, repeat):
+    """Reruns complets de l'application sur un store initialisé avec `state`."""
+    from streamlit.testing.v1 import AppTest
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["TOURNOI_AUTOSAVE_DIR"] = tmp
+        os.environ.pop("TOURNOI_DB", None)
+        with open(os.path.join(tmp, "snapshot.json"), "w", encoding="utf-8") as f:
+            json.dump(dict(state, journal_seq=0), f)
+
+        at = AppTest.from_file(APP_PATH, default_timeout=600)
+        t0 = time.perf_counter()
+        at.run()
+        results["rerun: démarrage (reprise du store)"] = (time.perf_counter() - t0) * 1000
+
+        for page in PAGES:
+            select_match(at)
+            at.sidebar.radio[0].set_value(page).run()
+            samples = []
+            for _ in range(repeat):
+                select_match(at)
+                t0 = time.perf_counter()
+                at.run()
+                samples.append((time.perf_counter() - t0) * 1000)
+            results[f"rerun: {page}"] = statistics.median(samples)
+            if at.exception:
+                raise RuntimeError(f"{page} : {at.exception[0].value}")
+
+        at.sidebar.radio[0].set_value("Console d'Arbitrage").run()
+        buttons = [b for b in at.button if b.label.startswith("🎯")]
+        if buttons:
+            samples = []
+            for _ in range(repeat):
+                select_match(at)
+                buttons = [b for b in at.button if b.label.startswith("🎯")]
+                t0 = time.perf_counter()
+                buttons[0].click().run()
+                samples.append((time.perf_counter() - t0) * 1000)
+            results["rerun: clic 🎯 (arbitrage)"] = statistics.median(samples)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Mesures plus lentes que la référence d'un facteur > `tolerance` (au-delà de 1 ms de bruit)."""
+    regressions = []
+    for size, ops in results.items():
+        for op, ms in ops.items():
+            ref = baseline.get(size, {}).get(op)
+            if ref is not None and ms > ref * tolerance and ms - ref > 1.0:
+                regressions.append(f"{size} — {op} : {ref:.1f} ms → {ms:.1f} ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="petites tailles seulement")
+    parser.add_argument("--no-pages", action="store_true", help="ne pas mesurer les reruns de l'application")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="fichier JSON où enregistrer les résultats")
+    parser.add_argument("--baseline", help="résultats de référence à comparer")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="facteur de ralentissement toléré")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for n_teams, n_matches in (QUICK_GRID if args.quick else FULL_GRID):
+        size = f"{n_teams} équipes / {n_matches} matchs"
+        state = make_tournament(n_teams, n_matches)
+        ops = bench_core(state, args.repeat)
+        if not args.no_pages:
+            ops.update(bench_pages(state, args.repeat))
+        results[size] = ops
+        print(f"\n== {size}")
+        for op, ms in ops.items():
+            print(f"  {op:<45} {ms:10.2f} ms")
+    for n_questions in BANK_GRID[:1] if args.quick else BANK_GRID:
+        size = f"banque de {n_questions} questions"
+        results[size] = ops = bench_bank(n_questions, args.repeat)
+        print(f"\n== {size}")
+        for op, ms in ops.items():
+            print(f"  {op:<45} {ms:10.2f} ms")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRégressions :\n  " + "\n  ".join(regressions))
+            return 1
+        print("\nAucune régression.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
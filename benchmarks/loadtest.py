@@ -0,0 +1,443 @@
+"""
+Test de charge : combien d'arbitres et de spectateurs simultanés pour un serveur Streamlit ?
+
+    python -m benchmarks.loadtest                              # 8 arbitres, 4 spectateurs, 60 s
+    python -m benchmarks.loadtest --referees 20 --viewers 10 --duration 120
+    python -m benchmarks.loadtest --p95 250 --out charge.json  # code retour 1 si le p95 des clics dépasse 250 ms
+
+L'application réelle est lancée par `streamlit run` (sans navigateur) sur
+127.0.0.1, dans un store neuf, et pilotée par N clients websocket qui parlent
+le protocole du navigateur (BackMsg / ForwardMsg sur /_stcore/stream) : chaque
+client est une session du serveur, avec son propre fil de script, et les
+reruns des sessions s'exécutent en même temps, comme en production.
+- Arbitre : choisit un match, clique sur 🎯 à un rythme aléatoire (loi
+  exponentielle autour de `--click-rate`), passe à la question suivante toutes
+  les `--clicks-per-question` attributions en moyenne, termine le match après
+  `--questions-per-match` questions puis en prend un autre.
+- Spectateur : affiche « Classement Général » et le relit toutes les `--view-every` s.
+
+Comme dans le navigateur, 🎯 et « Suivant » ne relancent que le fragment du
+panneau de score ; choisir un match, terminer et relire le classement relancent
+la page. La latence va de l'envoi du message au `script_finished` du serveur :
+le rendu du navigateur n'est pas compté. Les clients tournent dans un seul
+processus asyncio, séparé du serveur. Une action qui échoue (connexion perdue,
+délai dépassé) est comptée et la session est rouverte. La mémoire est celle du
+processus serveur (RSS).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from functools import partial
+
+import numpy as np
+
+from benchmarks.synthetic import APP_PATH, make_tournament
+
+CONSOLE = "Console d'Arbitrage"
+RANKING = "Classement Général"
+MATCH_SELECT = "Sélectionner la rencontre"
+
+
+def rss_mb(pid):
+    """Mémoire résidente d'un processus (Mo), None s'il n'existe plus."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except FileNotFoundError:
+        return None
+    except OSError:
+        out = subprocess.run(["ps", "-o", "rss=", "-p", str(pid)], capture_output=True, text=True).stdout.strip()
+        return int(out) / 2**10 if out else None
+
+
+class Recorder:
+    """Latences par action (ms), échecs, erreurs de l'application et mémoire du serveur."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.failures = {}
+        self.app_errors = []
+        self.memory = []
+
+    def record(self, action, ms):
+        self.latencies.setdefault(action, []).append(ms)
+
+    def failure(self, action, exc):
+        self.failures.setdefault(action, []).append(f"{type(exc).__name__}: {exc}")
+
+    def app_error(self, who, message):
+        self.app_errors.append(f"{who} : {message}")
+
+
+class Session:
+    """
+    Une session de navigateur : connexion websocket, valeurs des widgets renvoyées
+    à chaque rerun, et derniers éléments affichés, par fragment ("" : hors fragment).
+    """
+
+    def __init__(self, url, timeout):
+        self.url = url
+        self.timeout = timeout
+        self.ws = None
+        self.values = {}
+        self.elements = {}
+
+    async def connect(self):
+        import websockets
+
+        self.ws = await websockets.connect(self.url, subprotocols=["streamlit"], max_size=None,
+                                           open_timeout=self.timeout)
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+    def find(self, kind, prefix):
+        """[(widget, fragment)] des éléments `kind` affichés dont le libellé commence par `prefix`."""
+        return [(el, fragment) for fragment, els in self.elements.items()
+                for k, el in els if k == kind and el.label.startswith(prefix)]
+
+    def value(self, widget_id):
+        state = self.values.get(widget_id)
+        return None if state is None else state.string_value
+
+    async def rerun(self, trigger=None, fragment=""):
+        """
+        Relance la page (ou le seul `fragment`) avec les valeurs des widgets, plus
+        un clic sur le bouton `trigger`. Retourne les exceptions affichées par l'application.
+        """
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        msg = BackMsg()
+        msg.rerun_script.fragment_id = fragment
+        msg.rerun_script.widget_states.widgets.extend(self.values.values())
+        if trigger is not None:
+            click = msg.rerun_script.widget_states.widgets.add()
+            click.id = trigger
+            click.trigger_value = True
+        await self.ws.send(msg.SerializeToString())
+
+        shown, errors = {}, []
+        while True:
+            fwd = ForwardMsg()
+            fwd.ParseFromString(await asyncio.wait_for(self.ws.recv(), self.timeout))
+            kind = fwd.WhichOneof("type")
+            if kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+                element = fwd.delta.new_element
+                el_kind = element.WhichOneof("type")
+                shown.setdefault(fwd.delta.fragment_id, []).append((el_kind, getattr(element, el_kind)))
+                if el_kind == "exception":
+                    errors.append(f"{element.exception.type}: {element.exception.message}")
+            elif kind == "script_finished":
+                if fwd.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    break
+                shown = {}  # st.rerun() : seul l'affichage du rerun suivant compte
+        if fragment:
+            self.elements[fragment] = shown.get(fragment, [])
+        else:
+            self.elements = shown
+            # Le navigateur oublie les widgets qui ne sont plus affichés
+            ids = {el.id for els in shown.values() for _, el in els if hasattr(el, "id")}
+            self.values = {wid: state for wid, state in self.values.items() if wid in ids}
+        return errors
+
+    def select(self, widget_id, option):
+        """Choisit `option` dans une liste (radio, selectbox) : rerun de la page, comme dans le navigateur."""
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        self.values[widget_id] = WidgetState(id=widget_id, string_value=option)
+        return self.rerun()
+
+
+async def act(rec, action, session, step):
+    """
+    Exécute `step(session)` (choix du widget + rerun) et mesure de l'envoi à la fin du rerun.
+    Retourne False si l'action n'était pas possible, None si elle a échoué (comptée).
+    """
+    t0 = time.perf_counter()
+    try:
+        pending = step(session)
+        if pending is False:
+            return False
+        errors = await pending
+    except Exception as e:
+        rec.failure(action, e)
+        return None
+    rec.record(action, (time.perf_counter() - t0) * 1000)
+    for message in errors:
+        rec.app_error(action, message)
+    return True
+
+
+async def _open(page, session):
+    await session.connect()
+    errors = await session.rerun()
+    radio, _ = session.find("radio", "Navigation")[0]
+    return errors + await session.select(radio.id, page)
+
+
+async def open_session(rec, url, page, timeout):
+    session = Session(url, timeout)
+    if await act(rec, "ouverture", session, partial(_open, page)):
+        return session
+    await drop(session)
+    return None
+
+
+async def drop(session):
+    try:
+        await session.close()
+    except Exception:
+        pass
+
+
+def _pick_match(k, session):
+    """La `k`-ième rencontre (modulo leur nombre) ; False si elle est déjà choisie ou absente."""
+    found = session.find("selectbox", MATCH_SELECT)
+    if not found:
+        return False
+    box, _ = found[0]
+    option = box.options[k % len(box.options)]
+    if session.value(box.id) == option:
+        return False
+    return session.select(box.id, option)
+
+
+def _click(prefix, rng, session):
+    buttons = session.find("button", prefix)
+    if not buttons:
+        return False
+    button, fragment = rng.choice(buttons)
+    return session.rerun(trigger=button.id, fragment=fragment)
+
+
+async def pause(stop, delay):
+    """Attend `delay` s ; True si la charge s'arrête entre-temps."""
+    try:
+        await asyncio.wait_for(stop.wait(), delay)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+async def referee(k, args, rec, url, stop):
+    """Un arbitre : 🎯 au fil de l'eau, « Suivant », puis « TERMINER » et match suivant."""
+    rng = random.Random(k)
+    session, questions = None, 0
+    while not stop.is_set():
+        if session is None:
+            session = await open_session(rec, url, CONSOLE, args.timeout)
+            if session is None:
+                await pause(stop, 1.0)
+            continue
+        if await pause(stop, rng.expovariate(args.click_rate)):
+            break
+        outcome = await act(rec, "choix du match", session, partial(_pick_match, k))
+        if outcome is not None:
+            if questions >= args.questions_per_match:
+                outcome = await act(rec, "terminer", session, partial(_click, "🏁", rng))
+                if outcome:
+                    # « Actualiser » : la liste des rencontres ne propose plus le match clôturé
+                    outcome = await act(rec, "actualiser", session, lambda s: s.rerun())
+                questions = 0
+            elif rng.random() < 1 / args.clicks_per_question:
+                outcome = await act(rec, "suivant", session, partial(_click, "Suivant", rng))
+                questions += bool(outcome)
+            else:
+                outcome = await act(rec, "clic 🎯", session, partial(_click, "🎯", rng))
+                if outcome is False:
+                    questions = args.questions_per_match  # paquet épuisé : on termine le match
+        if outcome is None:
+            await drop(session)
+            session = None  # échec compté : session rouverte
+    if session is not None:
+        await drop(session)
+
+
+async def viewer(k, args, rec, url, stop):
+    """Un spectateur du classement, relu à intervalle régulier."""
+    rng = random.Random(-k - 1)
+    session = None
+    while not stop.is_set():
+        if session is None:
+            session = await open_session(rec, url, RANKING, args.timeout)
+            if session is None:
+                await pause(stop, 1.0)
+            continue
+        if await pause(stop, args.view_every * rng.uniform(0.8, 1.2)):
+            break
+        if await act(rec, "classement", session, lambda s: s.rerun()) is None:
+            await drop(session)
+            session = None
+    if session is not None:
+        await drop(session)
+
+
+async def sample_memory(rec, pid, stop, every=0.5):
+    while not await pause(stop, every):
+        mb = rss_mb(pid)
+        if mb is not None:
+            rec.memory.append(mb)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def prepare_store(tmp, args):
+    """Tournoi synthétique, aucun match commencé : repris dans un store neuf par la première session."""
+    state = make_tournament(args.teams, args.matches, n_questions=args.questions, finished_ratio=0.0)
+    with open(os.path.join(tmp, "snapshot.json"), "w", encoding="utf-8") as f:
+        json.dump(dict(state, journal_seq=0), f)
+
+
+def start_server(tmp, port, log):
+    """`streamlit run` sans navigateur, sur 127.0.0.1:`port`, avec la sauvegarde automatique dans `tmp`."""
+    env = dict(os.environ, TOURNOI_AUTOSAVE_DIR=tmp)
+    env.pop("TOURNOI_DB", None)
+    return subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP_PATH,
+         "--server.headless", "true", "--server.address", "127.0.0.1", "--server.port", str(port),
+         "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false"],
+        env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+
+async def first_session(server, url, timeout):
+    """Attend que le serveur accepte les connexions, puis ouvre une première session (reprise du store)."""
+    rec = Recorder()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and server.poll() is None:
+        session = await open_session(rec, url, CONSOLE, timeout)
+        if session is not None:
+            await drop(session)
+            if rec.app_errors:
+                raise RuntimeError("Erreur de l'application à l'ouverture :\n  " + "\n  ".join(rec.app_errors))
+            return rec.latencies["ouverture"][0]
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Le serveur n'a pas accepté de session.")
+
+
+async def run_load(args, server, url):
+    rec = Recorder()
+    startup = await first_session(server, url, args.timeout)
+    baseline = rss_mb(server.pid)
+    stop = asyncio.Event()
+    tasks = [asyncio.create_task(sample_memory(rec, server.pid, stop))]
+    tasks += [asyncio.create_task(referee(k, args, rec, url, stop)) for k in range(args.referees)]
+    tasks += [asyncio.create_task(viewer(k, args, rec, url, stop)) for k in range(args.viewers)]
+    t0 = time.perf_counter()
+    await pause(stop, args.duration)
+    stop.set()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - t0
+    final = rss_mb(server.pid)
+    if server.poll() is not None:
+        rec.app_error("serveur", f"arrêté pendant la charge (code {server.returncode})")
+    peak = max(rec.memory + [m for m in (baseline, final) if m is not None], default=None)
+    return rec, elapsed, startup, baseline, peak, final
+
+
+def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        prepare_store(tmp, args)
+        port = args.port or free_port()
+        url = f"ws://127.0.0.1:{port}/_stcore/stream"
+        log_path = os.path.join(tmp, "serveur.log")
+        with open(log_path, "w", encoding="utf-8") as log:
+            server = start_server(tmp, port, log)
+            try:
+                rec, elapsed, startup, baseline, peak, final = asyncio.run(run_load(args, server, url))
+            except Exception:
+                with open(log_path, encoding="utf-8") as f:
+                    print("Journal du serveur :\n" + f.read()[-3000:], file=sys.stderr)
+                raise
+            finally:
+                server.terminate()
+                try:
+                    server.wait(10)
+                except subprocess.TimeoutExpired:
+                    server.kill()
+                    server.wait()
+    n_sessions = max(1, args.referees + args.viewers)
+    return {
+        "serveur": {"commande": "streamlit run", "processus": 1, "port": port, "première session_ms": startup},
+        "sessions": {"arbitres": args.referees, "spectateurs": args.viewers},
+        "duration_s": elapsed,
+        "actions": {
+            action: {
+                "n": len(ms), "échecs": len(rec.failures.get(action, [])), "par_s": len(ms) / elapsed,
+                **dict(zip(["p50", "p95", "p99"], np.percentile(ms, [50, 95, 99]).tolist())),
+                "max": max(ms), "moyenne": statistics.fmean(ms),
+            }
+            for action, ms in sorted(rec.latencies.items())
+        },
+        "failures": {action: errs for action, errs in sorted(rec.failures.items())},
+        "memory_mb": {
+            "avant sessions": baseline, "pic": peak, "fin": final,
+            "par session": None if None in (baseline, peak) else (peak - baseline) / n_sessions,
+        },
+        "app_errors": rec.app_errors,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--referees", type=int, default=8, help="sessions d'arbitrage simultanées")
+    parser.add_argument("--viewers", type=int, default=4, help="sessions « Classement Général » simultanées")
+    parser.add_argument("--duration", type=float, default=60.0, help="durée de la charge (s)")
+    parser.add_argument("--click-rate", type=float, default=0.5, help="actions par seconde et par arbitre")
+    parser.add_argument("--clicks-per-question", type=float, default=3.0, help="attributions par question (moyenne)")
+    parser.add_argument("--questions-per-match", type=int, default=10)
+    parser.add_argument("--view-every", type=float, default=2.0, help="secondes entre deux relectures du classement")
+    parser.add_argument("--teams", type=int, default=60)
+    parser.add_argument("--matches", type=int, default=200)
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--port", type=int, help="port du serveur (par défaut : un port libre)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="délai maximal d'un rerun (s)")
+    parser.add_argument("--p95", type=float, help="budget (ms) du p95 des clics 🎯 ; code retour 1 s'il est dépassé")
+    parser.add_argument("--out", help="fichier JSON où enregistrer le rapport")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    print(f"\n== streamlit run (1 processus serveur) : {args.referees} arbitre(s), {args.viewers} spectateur(s), "
+          f"{report['duration_s']:.0f} s")
+    print(f"  {'action':<14} {'n':>6} {'échecs':>7} {'/s':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for action, r in report["actions"].items():
+        print(f"  {action:<14} {r['n']:>6} {r['échecs']:>7} {r['par_s']:>7.1f} {r['p50']:>7.0f}ms {r['p95']:>7.0f}ms "
+              f"{r['p99']:>7.0f}ms {r['max']:>7.0f}ms")
+    print("\n  Latences de l'envoi du message au script_finished du serveur, sessions en parallèle, "
+          "sans le rendu du navigateur.")
+    mem = report["memory_mb"]
+    if mem["par session"] is not None:
+        print(f"\n  mémoire du serveur : {mem['avant sessions']:.0f} Mo après la première session, "
+              f"pic {mem['pic']:.0f} Mo, fin {mem['fin']:.0f} Mo (~{mem['par session']:.1f} Mo par session)")
+    for action, errs in report["failures"].items():
+        print(f"\nÉchecs du banc ({action}, {len(errs)}) :\n  " + "\n  ".join(sorted(set(errs))[:5]))
+    if report["app_errors"]:
+        print("\nErreurs de l'application :\n  " + "\n  ".join(report["app_errors"][:20]))
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    clicks = report["actions"].get("clic 🎯")
+    if args.p95 is not None and clicks and clicks["p95"] > args.p95:
+        print(f"\nBudget dépassé : p95 des clics {clicks['p95']:.0f} ms > {args.p95:.0f} ms")
+        return 1
+    # Les échecs du banc sont rapportés sans faire échouer la mesure ; seules les exceptions de l'application comptent
+    return 1 if report["app_errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
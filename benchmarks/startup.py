@@ -0,0 +1,102 @@
+"""
+Budget de démarrage : serveur fraîchement relancé le jour J.
+
+    python -m benchmarks.startup                         # grille complète, budgets par défaut
+    python -m benchmarks.startup --cold 2.0 --warm 0.3   # budgets en secondes
+
+Pour chaque taille, un processus Python neuf (aucun module en cache) charge
+l'application sur un store initialisé, via `streamlit.testing.v1.AppTest` :
+- « à froid » : du lancement du processus à la fin du premier rerun ;
+- « premier rerun » : exécution du script seule (imports paresseux compris) ;
+- « rerun à chaud » : médiane des reruns suivants.
+Code retour 1 si un budget est dépassé.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Rien de l'application (ni pandas, ni numpy) n'est importé ici : le processus
+# enfant doit partir de zéro.
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "code.py")
+
+# (équipes, matchs, questions) ; (0, 0, 0) : premier lancement, store vide
+GRID = [(0, 0, 0), (50, 100, 500), (200, 1000, 5000), (1000, 10000, 20000)]
+
+
+def child(autosave_dir, repeat):
+    """Mesures dans le processus neuf ; résultat JSON sur la sortie standard."""
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["TOURNOI_AUTOSAVE_DIR"] = autosave_dir
+    os.environ.pop("TOURNOI_DB", None)
+    at = AppTest.from_file(APP_PATH, default_timeout=600)
+    t0 = time.perf_counter()
+    at.run()
+    first = time.perf_counter() - t0
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        at.run()
+        samples.append(time.perf_counter() - t0)
+    print(json.dumps({"first": first, "warm": statistics.median(samples)}))
+
+
+def measure(n_teams, n_matches, n_questions, repeat):
+    from benchmarks.synthetic import make_tournament
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if n_teams:
+            state = make_tournament(n_teams, n_matches, n_questions=n_questions)
+            with open(os.path.join(tmp, "snapshot.json"), "w", encoding="utf-8") as f:
+                json.dump(dict(state, journal_seq=0), f)
+            # le store est créé par un premier lancement, comme après une reprise
+            subprocess.run([sys.executable, "-m", "benchmarks.startup", "--child", tmp, "--repeat", "1"],
+                           check=True, capture_output=True)
+        t0 = time.perf_counter()
+        out = subprocess.run([sys.executable, "-m", "benchmarks.startup", "--child", tmp, "--repeat", str(repeat)],
+                             check=True, capture_output=True, text=True).stdout
+        cold = time.perf_counter() - t0
+    result = json.loads(out.strip().splitlines()[-1])
+    # le processus enfant termine après les reruns à chaud : on les retire du temps à froid
+    return {"cold": cold - result["warm"] * repeat, **result}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cold", type=float, default=2.0, help="budget à froid (s)")
+    parser.add_argument("--warm", type=float, default=0.3, help="budget d'un rerun à chaud (s)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="petites tailles seulement")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args.child, args.repeat)
+        return 0
+
+    over = []
+    print(f"{'taille':<40} {'à froid':>10} {'1er rerun':>10} {'à chaud':>10}")
+    for n_teams, n_matches, n_questions in (GRID[:2] if args.quick else GRID):
+        size = f"{n_teams} équipes / {n_matches} matchs / {n_questions} q." if n_teams else "store vide"
+        r = measure(n_teams, n_matches, n_questions, args.repeat)
+        print(f"{size:<40} {r['cold']:9.2f}s {r['first']:9.2f}s {r['warm']:9.3f}s")
+        if r["cold"] > args.cold:
+            over.append(f"{size} : à froid {r['cold']:.2f} s > {args.cold} s")
+        if r["warm"] > args.warm:
+            over.append(f"{size} : rerun à chaud {r['warm']:.3f} s > {args.warm} s")
+    if over:
+        print("\nBudget dépassé :\n  " + "\n  ".join(over))
+        return 1
+    print("\nBudgets respectés.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
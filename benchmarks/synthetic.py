@@ -0,0 +1,68 @@
+"""
+Tournois synthétiques au format de sauvegarde JSON, pour les mesures,
+et accès à l'application commun aux bancs qui la pilotent via AppTest.
+"""
+import os
+
+import numpy as np
+
+from tournament_core import schedule_matches
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "code.py")
+
+
+def select_match(at, k=0):
+    """
+    Choisit la `k`-ième rencontre (modulo leur nombre) de la Console d'Arbitrage.
+    Retourne False si la page affichée n'a pas de sélection de rencontre.
+    """
+    # AppTest ne sait pas relire un selectbox avec format_func : on fixe l'index avant chaque rerun
+    for sb in at.selectbox:
+        if sb.label.startswith("Sélectionner la rencontre"):
+            sb.select_index(k % len(sb.options))
+            return True
+    return False
+
+
+def make_tournament(n_teams, n_matches, players_per_team=4, n_questions=200, finished_ratio=0.8, seed=0):
+    """
+    Construit un état complet (format `export_state_json`) :
+    `n_teams` équipes, `n_matches` matchs à 3 équipes dont une part terminée,
+    scores et scores joueurs cohérents entre eux.
+    """
+    rng = np.random.default_rng(seed)
+    teams = [f"Équipe {i + 1:04d}" for i in range(n_teams)]
+    roster = [{"Equipe": t, "Joueur": f"{t} / J{j + 1}"} for t in teams for j in range(players_per_team)]
+    questions = [
+        {
+            "Manche": f"Manche {i % 4 + 1}", "Rubrique": f"Rubrique {i % 12 + 1}",
+            "Question": f"Question synthétique n°{i + 1} ?", "Points": int(rng.integers(1, 6)),
+            "Temps": int(rng.choice([10, 20, 30])), "Consigne": None,
+        }
+        for i in range(n_questions)
+    ]
+
+    per_round = max(1, n_teams // 3)
+    matches, progress, _ = schedule_matches(teams, -(-n_matches // per_round), seed=seed)
+    matches = dict(list(matches.items())[:n_matches])
+    progress = {mid: progress[mid] for mid in matches}
+
+    player_scores = {p["Joueur"]: 0 for p in roster}
+    for mid, m in matches.items():
+        done = rng.random() < finished_ratio
+        m["status"] = "Terminé" if done else "Prévu"
+        for t in m["teams"]:
+            score = int(rng.integers(0, 40)) if done else 0
+            m["scores"][t] = score
+            # tout le score de l'équipe au premier joueur : suffisant pour les mesures
+            player_scores[f"{t} / J1"] += score
+        progress[mid]["q_idx"] = int(rng.integers(0, n_questions)) if done else 0
+
+    return {
+        "teams": roster,
+        "questions": questions,
+        "matches": matches,
+        "player_scores": player_scores,
+        "match_progress": progress,
+        "manual_match_counter": 0,
+    }
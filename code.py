@@ -1,14 +1,217 @@
 import streamlit as st
-import pandas as pd
-import time
+import os
 import json
+import hashlib
+import html
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
+from functools import partial, wraps
+
+import numpy as np
+
+from tournament_core import (
+    TEAM_COLUMNS, QUESTION_COLUMNS, read_table, validate_teams, validate_questions, build_roster, roster_renames,
+    compute_match_points, compute_standings, copy_standings, standings_diff, apply_store_changes, standings_tables,
+    schedule_matches, validate_manual_teams, new_manual_match,
+    filter_matches, matches_table, state_to_dict, state_to_json, apply_event, TIEBREAKERS, rank_teams,
+    simulate_rankings, projection_table, table_blob, encode_save, decode_save, decode_saves, save_id, SaveError,
+    build_question_bank, bank_question, deck_length, deck_position, deck_positions, allocate_decks, DEFAULT_DECK_SIZE,
+    export_tables, write_xlsx, write_csv_zip, write_parquet_zip,
+)
 
 # --- CONFIGURATION DE LA PAGE ---
-st.set_page_config(page_title="Tournament Master - Gestion 9 Equipes", layout="wide", page_icon="🏆")
+st.set_page_config(page_title="Tournament Master", layout="wide", page_icon="🏆")
+
+# --- PROFILAGE DES RERUNS ---
+ROLLING_WINDOW = 1000   # mesures conservées par page / section pour les percentiles
+METRICS_EVERY = 1.0     # secondes minimum entre deux écritures du fichier de métriques
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Rerun en cours (module réexécuté à chaque rerun complet)
+_rerun = {"start": time.perf_counter(), "sections": {}}
+
+@st.cache_resource
+def get_metrics(metrics_dir):
+    """Mesures partagées par le processus : durées glissantes par page et par section."""
+    os.makedirs(metrics_dir, exist_ok=True)
+    return {
+        "lock": threading.Lock(),
+        "pages": {}, "sections": {}, "slow": {},
+        "slow_ms": float(os.environ.get("TOURNOI_SLOW_RERUN_MS", 500)),
+        "written": 0.0,
+    }
+
+@contextmanager
+def profile_section(name):
+    """Chronomètre un bloc ; les durées s'additionnent par nom sur le rerun en cours."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        sections = _rerun["sections"]
+        sections[name] = sections.get(name, 0.0) + (time.perf_counter() - t0) * 1000
+
+def profiled(fn):
+    """Version chronométrée d'une fonction (section au nom de la fonction)."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        with profile_section(fn.__name__):
+            return fn(*args, **kwargs)
+    return wrapper
+
+def profiled_fragment(label):
+    """
+    Pour un st.fragment : section du rerun complet qui l'affiche, ou rerun
+    à part entière (page `label`) quand le fragment est relancé seul.
+    """
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _rerun["start"] is not None:
+                with profile_section(fn.__name__):
+                    return fn(*args, **kwargs)
+            _rerun["start"] = time.perf_counter()
+            with measured_rerun(label), profile_section(fn.__name__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+@contextmanager
+def measured_rerun(page, rerun=None, metrics=None):
+    """
+    Corps d'un rerun, mesuré même s'il se termine par st.rerun(), st.stop() ou une
+    exception, qui se propagent ensuite normalement. `rerun` et `metrics` : mesure
+    hors du script (téléchargements), sinon le rerun en cours.
+    """
+    ending, failed = None, False
+    try:
+        yield
+    except Exception as e:
+        ending, failed = f"{type(e).__name__}: {e}", True
+        raise
+    except BaseException as e:
+        # st.rerun(), st.stop() : exceptions de contrôle de Streamlit
+        ending = type(e).__name__
+        raise
+    finally:
+        finish_rerun(page, ending, failed, rerun, metrics)
+
+def timed_download(label, metrics, fn, *args):
+    """
+    Callable d'un st.download_button : exécuté au téléchargement, après la fin du rerun
+    qui l'a affiché, il est mesuré à part comme un rerun de la page `label`.
+    """
+    rerun = {"start": time.perf_counter(), "sections": {}}
+    with measured_rerun(label, rerun, metrics):
+        return fn(*args)
+
+# Fonctions du cœur chronométrées à chaque appel
+validate_teams = profiled(validate_teams)
+validate_questions = profiled(validate_questions)
+build_roster = profiled(build_roster)
+build_question_bank = profiled(build_question_bank)
+compute_standings = profiled(compute_standings)
+standings_tables = profiled(standings_tables)
+rank_teams = profiled(rank_teams)
+schedule_matches = profiled(schedule_matches)
+filter_matches = profiled(filter_matches)
+matches_table = profiled(matches_table)
+state_to_dict = profiled(state_to_dict)
+state_to_json = profiled(state_to_json)
+
+def _percentiles(samples):
+    return dict(zip(QUANTILES, np.quantile(np.fromiter(samples, float), QUANTILES)))
+
+def metrics_tables(metrics):
+    """Tableaux p50 / p95 / p99 (ms) par page et par section."""
+    import pandas as pd
+    def table(series, label):
+        rows = []
+        for name, samples in sorted(series.items()):
+            q = _percentiles(samples)
+            rows.append({label: name, "Mesures": len(samples), "p50 (ms)": q[0.5], "p95 (ms)": q[0.95], "p99 (ms)": q[0.99]})
+        return pd.DataFrame(rows, columns=[label, "Mesures", "p50 (ms)", "p95 (ms)", "p99 (ms)"])
+    with metrics["lock"]:
+        pages = {k: list(v) for k, v in metrics["pages"].items()}
+        sections = {k: list(v) for k, v in metrics["sections"].items()}
+    return table(pages, "Page"), table(sections, "Section")
+
+def _prometheus_text(metrics):
+    """Export au format texte Prometheus (résumés en secondes + compteur de reruns lents)."""
+    def esc(value):
+        return value.replace("\\", "\\\\").replace('"', '\\"')
+    lines = []
+    for metric, label, series, help_text in (
+        ("tournoi_rerun_seconds", "page", metrics["pages"], "Durée des reruns complets par page"),
+        ("tournoi_section_seconds", "section", metrics["sections"], "Durée des sections et fonctions par rerun"),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} summary"]
+        for name, samples in sorted(series.items()):
+            tag = f'{label}="{esc(name)}"'
+            for q, v in _percentiles(samples).items():
+                lines.append(f'{metric}{{{tag},quantile="{q}"}} {v / 1000:.6f}')
+            lines.append(f"{metric}_sum{{{tag}}} {sum(samples) / 1000:.6f}")
+            lines.append(f"{metric}_count{{{tag}}} {len(samples)}")
+    lines += ["# HELP tournoi_slow_reruns_total Reruns au-delà du seuil", "# TYPE tournoi_slow_reruns_total counter"]
+    lines += [f'tournoi_slow_reruns_total{{page="{esc(p)}"}} {n}' for p, n in sorted(metrics["slow"].items())]
+    return "\n".join(lines) + "\n"
+
+def finish_rerun(page, ending=None, failed=False, rerun=None, metrics=None):
+    """
+    Clôt la mesure du rerun : durées glissantes, journal des reruns lents
+    (au-delà du seuil) et fichier de métriques Prometheus (au plus une fois par seconde).
+    `ending` : exception qui a interrompu le rerun ; un rerun en erreur (`failed`) est toujours journalisé.
+    """
+    rerun = _rerun if rerun is None else rerun
+    end = time.perf_counter()
+    total = (end - rerun["start"]) * 1000
+    sections = rerun["sections"]
+    if rerun.get("page_start"):
+        sections[f"page : {page}"] = (end - rerun["page_start"]) * 1000
+    metrics = get_metrics(AUTOSAVE_DIR) if metrics is None else metrics
+    with metrics["lock"]:
+        metrics["pages"].setdefault(page, deque(maxlen=ROLLING_WINDOW)).append(total)
+        for name, ms in sections.items():
+            metrics["sections"].setdefault(name, deque(maxlen=ROLLING_WINDOW)).append(ms)
+        slow = total > metrics["slow_ms"]
+        if slow:
+            metrics["slow"][page] = metrics["slow"].get(page, 0) + 1
+        now = time.monotonic()
+        export = now - metrics["written"] >= METRICS_EVERY
+        if export:
+            metrics["written"] = now
+            text = _prometheus_text(metrics)
+    if slow or failed:
+        entry = {
+            "time": datetime.now().isoformat(timespec="seconds"), "page": page, "ms": round(total, 1),
+            "sections": {k: round(v, 1) for k, v in sorted(sections.items(), key=lambda kv: -kv[1])},
+        }
+        if ending:
+            entry["fin"] = ending
+        with open(_autosave_path("slow_reruns.log"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    if export:
+        tmp = _autosave_path("metrics.prom.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, _autosave_path("metrics.prom"))
+    rerun.update(start=None, page_start=None, sections={})
+
+def _set_slow_ms():
+    # Seuil partagé par le processus : écrit seulement quand un arbitre le modifie
+    metrics = get_metrics(AUTOSAVE_DIR)
+    with metrics["lock"]:
+        metrics["slow_ms"] = st.session_state.slow_ms
 
 # --- STYLE PERSONNALISÉ ---
-st.markdown("""
+# Constante du module : Streamlit efface les éléments non réémis, la feuille de
+# style est donc renvoyée à chaque rerun, mais sans aucun calcul.
+PAGE_STYLE = """
     <style>
     .main { background-color: #f8f9fa; }
     .stButton>button { width: 100%; border-radius: 10px; height: 3em; font-weight: bold; }
@@ -17,135 +220,1087 @@ st.markdown("""
     .question-box { background-color: #fffbeb; border-left: 5px solid #f59e0b; padding: 15px; border-radius: 10px; margin: 10px 0; font-size: 1.2em; border: 1px solid #fef3c7; }
     .instruction-box { background-color: #eff6ff; border-left: 5px solid #3b82f6; padding: 15px; border-radius: 8px; font-style: italic; margin-bottom: 15px; color: #1e40af; }
     .format-info { background-color: #f0fdf4; border: 1px solid #16a34a; padding: 10px; border-radius: 5px; margin-bottom: 20px; }
+    .board { display: grid; grid-template-columns: 3fr 2fr; gap: 24px; font-size: 1.3em; }
+    .board table { width: 100%; border-collapse: collapse; }
+    .board td, .board th { padding: 6px 10px; border-bottom: 1px solid #e5e7eb; text-align: left; }
+    .board-live { background: linear-gradient(90deg, #1e3a8a 0%, #3b82f6 100%); color: white; padding: 14px; border-radius: 12px; margin-bottom: 12px; }
+    .board-live b { font-size: 1.2em; }
     .manual-badge { background-color: #7c3aed; color: white; padding: 2px 8px; border-radius: 12px; font-size: 0.75em; font-weight: bold; margin-left: 8px; }
     </style>
-    """, unsafe_allow_html=True)
-
-# --- INITIALISATION ---
-def init_session():
-    if 'teams_df' not in st.session_state:
-        st.session_state.teams_df = pd.DataFrame(columns=['Equipe', 'Joueur'])
-    if 'questions_df' not in st.session_state:
-        st.session_state.questions_df = pd.DataFrame(columns=['Manche', 'Rubrique', 'Question', 'Points', 'Temps', 'Consigne'])
-    if 'matches' not in st.session_state:
-        st.session_state.matches = {}
-    if 'player_scores' not in st.session_state:
-        st.session_state.player_scores = {}
-    if 'match_progress' not in st.session_state:
-        st.session_state.match_progress = {}
-    if 'manual_match_counter' not in st.session_state:
-        st.session_state.manual_match_counter = 0
-    if 'nb_teams_choice' not in st.session_state:
-        st.session_state.nb_teams_choice = 2
-
-init_session()
+    """
+st.markdown(PAGE_STYLE, unsafe_allow_html=True)
 
 # --- PERSISTENCE ---
-def export_state_json():
-    state = {
-        "teams": st.session_state.teams_df.to_dict(orient='records'),
-        "questions": st.session_state.questions_df.to_dict(orient='records'),
-        "matches": st.session_state.matches,
-        "player_scores": st.session_state.player_scores,
-        "match_progress": st.session_state.match_progress,
-        "manual_match_counter": st.session_state.manual_match_counter
+def _state_refs():
+    """Références vers l'état courant du modèle partagé (sans copie ni conversion)."""
+    model = read_model()
+    return {
+        "teams": model["setup"]["teams_df"],
+        "questions": model["setup"]["questions_df"],
+        "matches": model["matches"],
+        "player_scores": model["player_scores"],
+        "match_progress": model["match_progress"],
+        "manual_match_counter": model["manual_match_counter"]
     }
-    return json.dumps(state, indent=4)
 
-def import_state_json(uploaded_json):
+@profiled
+def export_state_json():
+    return state_to_json(_state_refs())
+
+def import_state_json(uploaded_files):
+    """Restaure une sauvegarde : JSON historique, complète, ou complète + différentielle(s)."""
     try:
-        data = json.load(uploaded_json)
-        st.session_state.teams_df = pd.DataFrame(data["teams"])
-        st.session_state.questions_df = pd.DataFrame(data["questions"])
-        st.session_state.matches = data["matches"]
-        st.session_state.player_scores = data["player_scores"]
-        st.session_state.match_progress = data.get("match_progress", {})
-        st.session_state.manual_match_counter = data.get("manual_match_counter", 0)
+        data = decode_saves([f.getvalue() for f in uploaded_files])
+        data.setdefault("match_progress", {})
+        data.setdefault("manual_match_counter", 0)
+        # Seuls les instantanés automatiques contiennent le détail question par question
+        awards = data.get("awards", [])
+        if not push_state(data, read_model()["version"],
+                          min_version=max((a[0] for a in awards), default=0), history=awards):
+            st.warning("Un autre arbitre vient de modifier le tournoi : restauration annulée, valider à nouveau.")
+            return
         st.success("Session restaurée avec succès !")
         st.rerun()
+    except SaveError as e:
+        st.error(str(e))
     except Exception as e:
-        st.error(f"Erreur de lecture du fichier JSON : {e}")
+        st.error(f"Erreur de lecture du fichier de sauvegarde : {e}")
+
+# --- SAUVEGARDES COMPACTES (COMPLÈTES + DIFFÉRENTIELLES) ---
+def _saves_path(name):
+    return os.path.join(AUTOSAVE_DIR, "saves", name)
+
+def setup_blobs():
+    """Équipes et questions au format compact, calculées une fois par tournoi partagé."""
+    setup = read_model()["setup"]
+    if "blobs" not in setup:
+        # Deux sessions peuvent les calculer en même temps : la première valeur enregistrée est gardée
+        setup.setdefault("blobs", {"teams": table_blob(setup["teams_df"]), "questions": table_blob(setup["questions_df"])})
+    return setup["blobs"]
+
+def _full_save_ref():
+    """Empreinte de la dernière complète de cette session : chaque arbitre a sa propre base."""
+    return st.session_state.setdefault('full_save', {})
+
+def _keep_full_save(data, ref):
+    """Conserve la sauvegarde complète sous son empreinte : base des prochaines différentielles de la session."""
+    os.makedirs(_saves_path(""), exist_ok=True)
+    sid = save_id(data)
+    with open(_saves_path(f"{sid}.tournoi"), "wb") as f:
+        f.write(data)
+    ref["id"] = sid
+
+@st.cache_resource(max_entries=4)
+def load_base_save(path):
+    """Sauvegarde complète relue une fois (fichier immuable : nommé par son empreinte)."""
+    with open(path, "rb") as f:
+        return decode_save(f.read())
+
+def export_full_save(state, blobs, ref):
+    # Appelée au téléchargement, hors du rerun (voir timed_download) : tout est lié à l'affichage
+    data, _ = encode_save(state, blobs=blobs)
+    _keep_full_save(data, ref)
+    return data
+
+@profiled
+def export_delta_save():
+    """
+    Différentielle depuis la dernière sauvegarde complète de cette session (quelques Ko) ;
+    complète s'il n'y en a pas encore ou si les équipes / questions ont changé.
+    Retourne (octets, "full" | "delta").
+    """
+    ref = _full_save_ref()
+    try:
+        base = load_base_save(_saves_path(f"{ref['id']}.tournoi")) if 'id' in ref else None
+    except FileNotFoundError:
+        base = None
+    data, kind = encode_save(_state_refs(), base, setup_blobs(), saved_at=datetime.now().isoformat(timespec="seconds"))
+    if kind == "full":
+        _keep_full_save(data, ref)
+    return data, kind
+
+# --- SAUVEGARDE AUTOMATIQUE (JOURNAL + INSTANTANÉS) ---
+AUTOSAVE_DIR = os.environ.get("TOURNOI_AUTOSAVE_DIR", "tournoi_autosave")
+SNAPSHOT_EVERY = 200  # événements journalisés entre deux instantanés
+
+def _autosave_path(name):
+    return os.path.join(AUTOSAVE_DIR, name)
+
+def _setup_path(digest):
+    return _autosave_path(os.path.join("setup", f"{digest}.json"))
+
+def _read_journal(after_seq):
+    """Événements du journal postérieurs à `after_seq` (une ligne tronquée par un crash est ignorée)."""
+    events = []
+    try:
+        with open(_autosave_path("journal.jsonl"), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                if event["seq"] > after_seq:
+                    events.append(event)
+    except FileNotFoundError:
+        pass
+    return events
+
+def _read_snapshot():
+    try:
+        with open(_autosave_path("snapshot.json"), encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    # Équipes et questions : empreinte du fichier de setup/ (les anciens instantanés les contiennent)
+    for key in ("teams", "questions"):
+        if isinstance(state.get(key), str):
+            with open(_setup_path(state[key]), encoding="utf-8") as f:
+                state[key] = json.load(f)
+    return state
+
+def _write_file(path, data):
+    """Écriture atomique et durable (fichier temporaire, fsync, renommage)."""
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+def _keep_setup(records):
+    """Écrit une table du tournoi sous l'empreinte de son contenu (une seule fois) ; retourne l'empreinte."""
+    data = json.dumps(records, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()
+    if not os.path.exists(_setup_path(digest)):
+        os.makedirs(os.path.dirname(_setup_path(digest)), exist_ok=True)
+        _write_file(_setup_path(digest), data)
+    return digest
+
+def _prune_setup(keep):
+    """Supprime les tables que l'instantané courant ne référence plus."""
+    folder = _autosave_path("setup")
+    for name in os.listdir(folder):
+        if name.removesuffix(".json") not in keep:
+            os.remove(os.path.join(folder, name))
+
+@st.cache_resource
+def get_autosave(autosave_dir):
+    """
+    Journal partagé par le processus (un par dossier) : verrou d'écriture, compteurs,
+    et compaction en arrière-plan (un seul instantané à la fois).
+    """
+    os.makedirs(autosave_dir, exist_ok=True)
+    # Après compaction, le journal ne garde que les événements postérieurs à l'instantané :
+    # compter ses lignes évite de relire tout l'instantané au démarrage du serveur.
+    try:
+        with open(os.path.join(autosave_dir, "journal.jsonl"), "rb") as f:
+            pending = sum(1 for _ in f)
+    except FileNotFoundError:
+        pending = 0
+    return {
+        "lock": threading.Lock(), "since_snapshot": pending,
+        "snapshot_lock": threading.Lock(), "compacting": False, "setup": None,
+        "pool": ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot"),
+    }
+
+def journal_event(event, seq):
+    """
+    Ajoute un événement au journal ; tous les SNAPSHOT_EVERY événements, la compaction
+    en instantané part en arrière-plan (le clic qui la déclenche ne l'attend pas).
+    `seq` est la version du store partagé produite par l'événement.
+    """
+    autosave = get_autosave(AUTOSAVE_DIR)
+    with autosave["lock"]:
+        autosave["since_snapshot"] += 1
+        line = json.dumps({"seq": seq, **event})
+        with open(_autosave_path("journal.jsonl"), "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        due = autosave["since_snapshot"] >= SNAPSHOT_EVERY and not autosave["compacting"]
+        if due:
+            autosave["compacting"] = True
+    if due:
+        autosave["pool"].submit(_compact, autosave)
+
+def _compact(autosave):
+    """Compaction en arrière-plan ; une erreur est affichée dans l'onglet de sauvegarde."""
+    try:
+        with autosave["snapshot_lock"]:
+            _snapshot(autosave)
+    except Exception as e:
+        autosave["error"] = f"{datetime.now():%H:%M:%S} : {e}"
+    finally:
+        autosave["compacting"] = False
+
+def write_snapshot():
+    """Instantané immédiat (opérations d'administration, bouton) ; attend une compaction en cours."""
+    autosave = get_autosave(AUTOSAVE_DIR)
+    with autosave["snapshot_lock"]:
+        _snapshot(autosave)
+
+def _snapshot(autosave):
+    """
+    Écrit l'état modifiable du store (format JSON de sauvegarde) et compacte le journal.
+    Équipes et questions ne sont relues et écrites (dans setup/, sous leur empreinte)
+    que si le tournoi a changé : l'instantané ne garde que leurs empreintes.
+    Le verrou du journal n'est pris que pour en réécrire la fin.
+    """
+    known = autosave["setup"]
+    conn = _connect(STORE_PATH)
+    try:
+        conn.execute("BEGIN")
+        state, version, setup_version = _read_state(conn, known["version"] if known else None)
+        state["awards"] = _read_awards(conn, version)
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    if "teams" in state:
+        known = {"version": setup_version, "teams": _keep_setup(state["teams"]),
+                 "questions": _keep_setup(state["questions"])}
+    state.update(teams=known["teams"], questions=known["questions"], journal_seq=version)
+    _write_file(_autosave_path("snapshot.json"), json.dumps(state).encode("utf-8"))
+    if known is not autosave["setup"]:
+        autosave["setup"] = known
+        _prune_setup({known["teams"], known["questions"]})
+    with autosave["lock"]:
+        # Les événements validés dans le store après la lecture restent dans le journal
+        tail = _read_journal(version)
+        with open(_autosave_path("journal.jsonl"), "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(e) + "\n" for e in tail)
+        autosave["since_snapshot"] = len(tail)
+    autosave["snapshot_time"] = datetime.now()
+    autosave.pop("error", None)
+
+def load_autosave():
+    """
+    Dernier instantané + rejeu de la fin du journal.
+    Retourne (état, dernière séquence) ou None si rien n'est sauvegardé.
+    """
+    state = _read_snapshot()
+    if state is None:
+        return None
+    seq = state.pop("journal_seq", 0)
+    for event in sorted(_read_journal(seq), key=lambda e: e["seq"]):
+        apply_event(state, event)
+        seq = event["seq"]
+    return state, seq
+
+# --- STORE PARTAGÉ (SQLITE) ---
+# Source de vérité commune à toutes les sessions (plusieurs arbitres en parallèle).
+# La session garde une copie locale, resynchronisée quand la version globale change.
+STORE_PATH = os.environ.get("TOURNOI_DB", os.path.join(AUTOSAVE_DIR, "tournoi.db"))
+
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+CREATE TABLE IF NOT EXISTS matches (
+    mid TEXT PRIMARY KEY, teams TEXT NOT NULL, type TEXT NOT NULL, label TEXT,
+    status TEXT NOT NULL, q_idx INTEGER NOT NULL DEFAULT 0, version INTEGER NOT NULL DEFAULT 0,
+    round INTEGER, deck TEXT
+);
+CREATE TABLE IF NOT EXISTS match_scores (
+    mid TEXT NOT NULL, team TEXT NOT NULL, score INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (mid, team)
+);
+CREATE TABLE IF NOT EXISTS player_scores (player TEXT PRIMARY KEY, score INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS awards (
+    version INTEGER PRIMARY KEY, mid TEXT NOT NULL, q_idx INTEGER NOT NULL,
+    team TEXT NOT NULL, player TEXT NOT NULL, pts INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta VALUES
+    ('version', 0), ('setup_version', 0), ('reset_version', 0), ('manual_match_counter', 0),
+    ('teams', '[]'), ('questions', '[]');
+"""
+# matches.version : version du store à la dernière modification du match (relectures incrémentales).
+# meta.reset_version : dernière écriture qui a remplacé ou supprimé des matchs (relecture complète).
+NEXT_VERSION = "(SELECT value + 1 FROM meta WHERE key = 'version')"
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+@st.cache_resource
+def get_store(path):
+    """Crée le schéma une fois par processus et par base ; chaque thread de session a sa connexion."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = _connect(path)
+    conn.executescript(STORE_SCHEMA)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(matches)")}
+    if "round" not in columns:
+        conn.execute("ALTER TABLE matches ADD COLUMN round INTEGER")
+    if "deck" not in columns:
+        conn.execute("ALTER TABLE matches ADD COLUMN deck TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS matches_version ON matches (version)")
+    conn.close()
+    return threading.local()
+
+def _db():
+    local = get_store(STORE_PATH)
+    if getattr(local, "conn", None) is None:
+        local.conn = _connect(STORE_PATH)
+    return local.conn
+
+@contextmanager
+def _write_tx():
+    """Transaction d'écriture courte ; les lecteurs ne sont jamais bloqués (WAL)."""
+    conn = _db()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+def _bump_version(conn, min_version=0):
+    return conn.execute(
+        "UPDATE meta SET value = max(value, ?) + 1 WHERE key = 'version' RETURNING value", (min_version,)
+    ).fetchone()[0]
+
+def store_version():
+    return _db().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+@profiled
+def read_store_state(known_setup_version=None):
+    """
+    Lit l'état complet du store dans une seule transaction, au format de sauvegarde JSON.
+    Les équipes et questions ne sont relues que si `setup_version` diffère de `known_setup_version`.
+    Retourne (état, version, setup_version).
+    """
+    conn = _db()
+    conn.execute("BEGIN")
+    try:
+        return _read_state(conn, known_setup_version)
+    finally:
+        conn.execute("COMMIT")
+
+def _read_state(conn, known_setup_version=None):
+    """Corps de read_store_state, dans la transaction de lecture ouverte par l'appelant."""
+    meta = dict(conn.execute(
+        "SELECT key, value FROM meta WHERE key IN ('version', 'setup_version', 'manual_match_counter')"
+    ))
+    matches, progress = _read_matches(conn)
+    state = {
+        "matches": matches,
+        "player_scores": dict(conn.execute("SELECT player, score FROM player_scores")),
+        "match_progress": progress,
+        "manual_match_counter": meta['manual_match_counter'],
+    }
+    if meta['setup_version'] != known_setup_version:
+        for key in ("teams", "questions"):
+            state[key] = json.loads(conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0])
+    return state, meta['version'], meta['setup_version']
+
+def _read_matches(conn, since=None):
+    """Matchs et questions courantes : tous, ou seulement ceux modifiés après la version `since`."""
+    where, args = ("WHERE version > ?", (since,)) if since is not None else ("", ())
+    matches, progress = {}, {}
+    for mid, teams, m_type, label, status, q_idx, rnd, deck in conn.execute(
+        f"SELECT mid, teams, type, label, status, q_idx, round, deck FROM matches {where} ORDER BY rowid", args
+    ):
+        teams = json.loads(teams)
+        matches[mid] = {'teams': teams, 'scores': {t: 0 for t in teams}, 'status': status, 'type': m_type}
+        if label is not None:
+            matches[mid]['label'] = label
+        if rnd is not None:
+            matches[mid]['round'] = rnd
+        if deck is not None:
+            matches[mid]['deck'] = json.loads(deck)
+        progress[mid] = {"q_idx": q_idx}
+    scores = "SELECT mid, team, score FROM match_scores"
+    if since is not None:
+        scores += f" WHERE mid IN (SELECT mid FROM matches {where})"
+    for mid, team, score in conn.execute(scores, args):
+        matches[mid]['scores'][team] = score
+    return matches, progress
+
+@profiled
+def read_store_changes(since, setup_version):
+    """
+    Changements du store depuis la version `since`, dans une seule transaction : matchs
+    modifiés ou créés (matches.version), points attribués et compteur des matchs manuels.
+    Retourne (changements, version), ou None si une relecture complète s'impose : données
+    du tournoi autres que `setup_version`, ou matchs remplacés ou supprimés depuis.
+    """
+    conn = _db()
+    conn.execute("BEGIN")
+    try:
+        meta = dict(conn.execute(
+            "SELECT key, value FROM meta "
+            "WHERE key IN ('version', 'setup_version', 'reset_version', 'manual_match_counter')"
+        ))
+        if meta['setup_version'] != setup_version or meta['reset_version'] > since:
+            return None
+        matches, progress = _read_matches(conn, since)
+        changes = {
+            "matches": matches, "match_progress": progress, "awards": _read_awards(conn, meta['version'], since),
+            "manual_match_counter": meta['manual_match_counter'],
+        }
+        return changes, meta['version']
+    finally:
+        conn.execute("COMMIT")
+
+def store_awards(max_version=None):
+    """Points attribués [version, match, question, équipe, joueur, points], dans l'ordre des attributions."""
+    return _read_awards(_db(), max_version)
+
+def _read_awards(conn, max_version=None, since=0):
+    return [list(row) for row in conn.execute(
+        "SELECT version, mid, q_idx, team, player, pts FROM awards WHERE version > ? AND version <= ? ORDER BY version",
+        (since, max_version if max_version is not None else 2**62)
+    )]
+
+def store_save_state(state, expected, min_version=0, history=None):
+    """
+    Remplace les matchs du store (calendrier, restauration), si personne n'y a écrit
+    depuis la version `expected` ; sinon None, sans rien modifier.
+    Les équipes et questions, comme les scores des joueurs, ne sont réécrits que si `state` les contient.
+    `history` remplace le détail des points attribués (lignes de store_awards) ;
+    None le conserve pour les matchs toujours présents.
+    Retourne (version, setup_version).
+    """
+    with _write_tx() as conn:
+        if conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0] != expected:
+            return None
+        version = _bump_version(conn, min_version)
+        conn.execute("UPDATE meta SET value = ? WHERE key = 'reset_version'", (version,))
+        if "teams" in state:
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'teams'", (json.dumps(state["teams"]),))
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'questions'", (json.dumps(state["questions"]),))
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'setup_version'")
+        conn.execute("UPDATE meta SET value = ? WHERE key = 'manual_match_counter'", (state["manual_match_counter"],))
+        conn.execute("DELETE FROM matches")
+        conn.execute("DELETE FROM match_scores")
+        progress = state.get("match_progress", {})
+        conn.executemany("INSERT INTO matches VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+            (mid, json.dumps(m['teams']), m.get('type', 'auto'), m.get('label'), m['status'],
+             progress.get(mid, {}).get("q_idx", 0), version, m.get('round'),
+             json.dumps(m['deck']) if m.get('deck') else None)
+            for mid, m in state["matches"].items()
+        ])
+        conn.executemany("INSERT INTO match_scores VALUES (?, ?, ?)", [
+            (mid, t, s) for mid, m in state["matches"].items() for t, s in m['scores'].items()
+        ])
+        if "player_scores" in state:
+            conn.execute("DELETE FROM player_scores")
+            conn.executemany("INSERT INTO player_scores VALUES (?, ?)", state["player_scores"].items())
+        if history is None:
+            conn.execute("DELETE FROM awards WHERE mid NOT IN (SELECT mid FROM matches)")
+        else:
+            conn.execute("DELETE FROM awards")
+            conn.executemany("INSERT INTO awards VALUES (?, ?, ?, ?, ?, ?)", history)
+        setup_version = conn.execute("SELECT value FROM meta WHERE key = 'setup_version'").fetchone()[0]
+    return version, setup_version
+
+def store_save_setup(setup, expected, renames, players):
+    """
+    Remplace les équipes et questions (import) sans toucher aux matchs ni aux scores : les
+    points attribués entre-temps par les autres arbitres sont conservés. Le score et le détail
+    des points des joueurs renommés ({ancien: nouveau}) les suivent ; les nouveaux `players`
+    partent de zéro. None si un autre import est passé depuis `expected` (setup_version).
+    Retourne (version, setup_version).
+    """
+    with _write_tx() as conn:
+        row = conn.execute(
+            "UPDATE meta SET value = value + 1 WHERE key = 'setup_version' AND value = ? RETURNING value", (expected,)
+        ).fetchone()
+        if row is None:
+            return None
+        for key in ("teams", "questions"):
+            conn.execute("UPDATE meta SET value = ? WHERE key = ?", (json.dumps(setup[key]), key))
+        for old, new in renames.items():
+            conn.execute(
+                "INSERT INTO player_scores SELECT ?, score FROM player_scores WHERE player = ? "
+                "ON CONFLICT(player) DO UPDATE SET score = score + excluded.score", (new, old)
+            )
+            conn.execute("DELETE FROM player_scores WHERE player = ?", (old,))
+            conn.execute("UPDATE awards SET player = ? WHERE player = ?", (new, old))
+        conn.executemany("INSERT OR IGNORE INTO player_scores VALUES (?, 0)", [(p,) for p in players])
+        return _bump_version(conn), row[0]
+
+def store_award(mid, q_idx, team, player, pts):
+    """
+    Incrément atomique (aucune mise à jour perdue), à la question `q_idx` affichée par l'arbitre.
+    None si le match est clos ou supprimé, ou si un autre arbitre a déjà changé de question.
+    """
+    with _write_tx() as conn:
+        updated = conn.execute(
+            "UPDATE match_scores SET score = score + ? WHERE mid = ? AND team = ? "
+            "AND EXISTS (SELECT 1 FROM matches WHERE mid = ? AND q_idx = ? AND status != 'Terminé')",
+            (pts, mid, team, mid, q_idx)
+        ).rowcount
+        if not updated:
+            return None
+        conn.execute(
+            "INSERT INTO player_scores VALUES (?, ?) ON CONFLICT(player) DO UPDATE SET score = score + excluded.score",
+            (player, pts)
+        )
+        version = _bump_version(conn)
+        conn.execute("UPDATE matches SET version = ? WHERE mid = ?", (version, mid))
+        # Détail question par question (exports)
+        conn.execute("INSERT INTO awards VALUES (?, ?, ?, ?, ?, ?)", (version, mid, q_idx, team, player, pts))
+        return version
+
+def store_close(mid):
+    with _write_tx() as conn:
+        if not conn.execute(
+            f"UPDATE matches SET status = 'Terminé', version = {NEXT_VERSION} WHERE mid = ? AND status != 'Terminé'",
+            (mid,)
+        ).rowcount:
+            return None
+        return _bump_version(conn)
+
+def store_advance(mid, expected_q_idx):
+    """Versionnement optimiste : échoue si un autre arbitre a déjà changé de question."""
+    with _write_tx() as conn:
+        if not conn.execute(
+            f"UPDATE matches SET q_idx = q_idx + 1, version = {NEXT_VERSION} "
+            "WHERE mid = ? AND q_idx = ? AND status != 'Terminé'", (mid, expected_q_idx)
+        ).rowcount:
+            return None
+        return _bump_version(conn)
+
+def store_create_match(teams, label, deck_size=None, rounds=None):
+    """
+    Réserve un numéro de match manuel et crée le match, avec un paquet de
+    `deck_size` questions pris à la suite de ceux des autres matchs.
+    Retourne (mid, match, compteur, version).
+    """
+    with _write_tx() as conn:
+        counter = conn.execute(
+            "UPDATE meta SET value = value + 1 WHERE key = 'manual_match_counter' RETURNING value"
+        ).fetchone()[0]
+        mid = f"M{counter}"
+        match = new_manual_match(teams, label, counter)
+        if deck_size:
+            decks = {m: {'deck': json.loads(d)} for m, d in conn.execute("SELECT mid, deck FROM matches WHERE deck IS NOT NULL")}
+            match['deck'] = allocate_decks(decks, 1, deck_size, rounds)[0]
+        version = _bump_version(conn)
+        conn.execute("INSERT INTO matches VALUES (?, ?, 'manuel', ?, 'Prévu', 0, ?, NULL, ?)",
+                     (mid, json.dumps(teams), match['label'], version, json.dumps(match['deck']) if 'deck' in match else None))
+        conn.executemany("INSERT INTO match_scores VALUES (?, ?, 0)", [(mid, t) for t in teams])
+        return mid, match, counter, version
+
+def store_delete_match(mid):
+    with _write_tx() as conn:
+        if not conn.execute(
+            "DELETE FROM matches WHERE mid = ? AND type = 'manuel' AND status != 'Terminé'", (mid,)
+        ).rowcount:
+            return None
+        conn.execute("DELETE FROM match_scores WHERE mid = ?", (mid,))
+        conn.execute("DELETE FROM awards WHERE mid = ?", (mid,))
+        version = _bump_version(conn)
+        conn.execute("UPDATE meta SET value = ? WHERE key = 'reset_version'", (version,))
+        return version
+
+def _frame(records, columns):
+    import pandas as pd
+    return pd.DataFrame(records) if records else pd.DataFrame(columns=columns)
+
+def read_shared_state():
+    """
+    Lit le store ; équipes et questions ne sont relues que si aucune session
+    du processus ne les détient déjà. Retourne (état, version, données du tournoi).
+    """
+    state, version, setup_version = read_store_state(latest_shared_version())
+    if "teams" not in state:
+        setup = shared_setup(setup_version)
+        if setup is not None:
+            return state, version, setup
+        state, version, setup_version = read_store_state()
+    setup = share_setup(setup_version, _frame(state["teams"], TEAM_COLUMNS),
+                        _frame(state["questions"], QUESTION_COLUMNS + ['Consigne']))
+    return state, version, setup
+
+# --- MODÈLE DE LECTURE PARTAGÉ ---
+@st.cache_resource
+def get_read_model(store_path):
+    """Dernier état lu du store, commun à toutes les sessions du processus (voir read_model)."""
+    return {"lock": threading.Lock(), "model": None}
+
+def read_model():
+    """
+    Tournoi à la version courante du store, partagé par toutes les sessions : une seule
+    relecture par nouvelle version, tous arbitres confondus, incrémentale sauf après un
+    import, un calendrier, une restauration ou une suppression de match. Un modèle publié
+    n'est plus modifié : la version suivante en est une copie, qui partage les matchs inchangés.
+    Les sessions n'en gardent aucune copie, seulement l'état de leurs widgets.
+    """
+    shared = get_read_model(STORE_PATH)
+    version = store_version()
+    model = shared["model"]
+    if model is None or model["version"] < version:
+        with shared["lock"]:
+            model = shared["model"]
+            if model is None or model["version"] < version:
+                model = shared["model"] = next_model(model)
+    return model
+
+@profiled
+def next_model(model):
+    """Modèle à la version courante du store, à partir du précédent (None : relecture complète)."""
+    changes = None if model is None else read_store_changes(model["version"], model["setup"]["id"][1])
+    if changes is None:
+        state, version, setup = read_shared_state()
+        state.pop("teams", None)
+        state.pop("questions", None)
+        for pid in setup["roster"]['player_team']:
+            state["player_scores"].setdefault(pid, 0)
+        standings = compute_standings(setup["roster"]['teams'], state["matches"], state["player_scores"])
+        return {**state, "version": version, "setup": setup, "standings": standings}
+    changes, version = changes
+    model = {
+        **model, "version": version, "manual_match_counter": changes["manual_match_counter"],
+        "matches": dict(model["matches"]), "match_progress": dict(model["match_progress"]),
+        "player_scores": dict(model["player_scores"]), "standings": copy_standings(model["standings"]),
+    }
+    apply_store_changes(model, model["standings"], changes)
+    return model
+
+def drop_read_model(model):
+    """Force une relecture complète au prochain read_model (classement incohérent)."""
+    shared = get_read_model(STORE_PATH)
+    with shared["lock"]:
+        if shared["model"] is model:
+            shared["model"] = None
+
+@profiled
+def push_state(state, expected, min_version=0, history=None):
+    """
+    Remplace les matchs du store par ceux de `state` (format de sauvegarde ; voir
+    store_save_state) puis fait un instantané.
+    Retourne False si le store a changé depuis la version `expected`.
+    """
+    if "teams" in state:
+        import pandas as pd
+        frames = {key: pd.DataFrame(state[key]) for key in ("teams", "questions")}
+        state = state_to_dict({**state, **frames})
+    saved = store_save_state(state, expected, min_version, history)
+    if saved is None:
+        return False
+    if "teams" in state:
+        # Les données restaurées deviennent celles du tournoi pour tout le processus
+        share_setup(saved[1], frames["teams"], frames["questions"])
+    write_snapshot()
+    return True
+
+# --- DONNÉES PARTAGÉES ENTRE SESSIONS (LECTURE SEULE) ---
+@st.cache_resource
+def get_shared_setups():
+    """
+    Équipes, banque de questions et index des joueurs, une seule fois par processus
+    et par tournoi (base partagée + version des données importées), référencés par
+    le modèle partagé. Ces objets ne sont pas modifiés sur place, sauf les caches remplis
+    à la demande (paquets de la banque, tables compactes des sauvegardes) : écrits par
+    setdefault, si deux sessions les calculent en même temps, la première valeur est gardée.
+    """
+    return {"lock": threading.Lock(), "tournaments": {}}
+
+def tournament_id(setup_version):
+    return (os.path.abspath(STORE_PATH), setup_version)
+
+def latest_shared_version():
+    """Dernière version des données importées déjà chargée dans le processus pour cette base."""
+    shared = get_shared_setups()
+    path = os.path.abspath(STORE_PATH)
+    with shared["lock"]:
+        return next((v for p, v in shared["tournaments"] if p == path), None)
+
+def shared_setup(setup_version):
+    shared = get_shared_setups()
+    with shared["lock"]:
+        return shared["tournaments"].get(tournament_id(setup_version))
+
+def share_setup(setup_version, teams_df, questions_df, roster=None):
+    """
+    Enregistre les données d'un tournoi (ou renvoie celles déjà enregistrées).
+    Une nouvelle version remplace les précédentes de la même base : la mémoire
+    dépend du nombre de tournois, pas du nombre de sessions.
+    """
+    shared = get_shared_setups()
+    tid = tournament_id(setup_version)
+    with shared["lock"]:
+        setup = shared["tournaments"].get(tid)
+        if setup is None:
+            setup = {
+                "id": tid, "teams_df": teams_df, "questions_df": questions_df,
+                "roster": roster if roster is not None else build_roster(teams_df),
+                "bank": build_question_bank(questions_df),
+            }
+            for old in [k for k in shared["tournaments"] if k[0] == tid[0]]:
+                del shared["tournaments"][old]
+            shared["tournaments"][tid] = setup
+    return setup
+
+# --- IMPORT DES FICHIERS ---
+def file_digest(uploaded):
+    """Empreinte SHA-256 du contenu d'un fichier téléversé."""
+    return hashlib.sha256(uploaded.getvalue()).hexdigest()
+
+@profiled
+@st.cache_data(show_spinner=False, max_entries=8)
+def parse_teams_file(digest, name, _data):
+    """
+    Lit et valide un fichier équipes (mis en cache par empreinte du contenu).
+    Retourne (df, erreurs, avertissements).
+    """
+    return validate_teams(read_table(_data, name))
+
+@profiled
+@st.cache_data(show_spinner=False, max_entries=8)
+def parse_questions_file(digest, name, _data):
+    """
+    Lit et valide une banque de questions (mise en cache par empreinte du contenu).
+    Retourne (df, erreurs, avertissements).
+    """
+    return validate_questions(read_table(_data, name))
+
+@profiled
+def push_setup(teams_df=None, questions_df=None):
+    """
+    Publie des équipes ou des questions importées (l'autre table reste celle du tournoi)
+    sans réécrire les matchs ni les scores, puis fait un instantané. Les scores des joueurs
+    dont l'identifiant change (homonyme apparu ou disparu) suivent le joueur. Si un autre
+    import est passé entre-temps, l'import est retenté une fois sur les données à jour.
+    """
+    for _ in range(2):
+        setup = read_model()["setup"]
+        teams = setup["teams_df"] if teams_df is None else teams_df
+        questions = setup["questions_df"] if questions_df is None else questions_df
+        roster = setup["roster"] if teams_df is None else build_roster(teams)
+        saved = store_save_setup(state_to_dict({"teams": teams, "questions": questions}), setup["id"][1],
+                                 roster_renames(setup["roster"], roster), roster['player_team'])
+        if saved is not None:
+            # Les données importées par cette session deviennent celles du tournoi pour tout le processus
+            share_setup(saved[1], teams, questions, roster)
+            write_snapshot()
+            return True
+    return False
 
 # --- LOGIQUE TOURNOI ---
-def generate_schedule(teams):
-    if len(teams) != 9:
-        st.error(f"Le tournoi nécessite exactement 9 équipes (actuellement {len(teams)}).")
-        return
-    indices = [[0, 1, 2], [3, 4, 5], [6, 7, 8], [0, 3, 6], [1, 4, 7], [2, 5, 8]]
-    matches = {}
-    for i, grp in enumerate(indices):
-        mid = str(i+1)
-        m_teams = [teams[j] for j in grp]
-        matches[mid] = {'teams': m_teams, 'scores': {t: 0 for t in m_teams}, 'status': 'Prévu', 'type': 'auto'}
-        st.session_state.match_progress[mid] = {"q_idx": 0}
-    st.session_state.matches = matches
+def generate_schedule(teams, n_rounds=2, group_size=3, duels=False, deck_size=None, rounds=None):
+    """
+    Remplace les matchs par un calendrier de `n_rounds` tours (voir build_schedule).
+    Avec `deck_size`, chaque match reçoit son paquet de questions tiré dans les manches `rounds`.
+    """
+    schedule = schedule_matches(teams, n_rounds, group_size, duels)
+    if schedule is None:
+        st.error(f"Pas assez d'équipes pour des matchs à {group_size} (actuellement {len(teams)}).")
+        return None
+    matches, progress, stats = schedule
+    if deck_size:
+        for m, deck in zip(matches.values(), allocate_decks({}, len(matches), deck_size, rounds)):
+            m['deck'] = deck
+    model = read_model()
+    state = {"matches": matches, "match_progress": progress, "manual_match_counter": model["manual_match_counter"]}
+    if not push_state(state, model["version"], history=[]):
+        st.warning("Un autre arbitre vient de modifier le tournoi : calendrier non enregistré, générer à nouveau.")
+        return None
+    return stats
 
 # --- CRÉATION D'UN MATCH MANUEL ---
-def create_manual_match(selected_teams, match_label):
+def create_manual_match(selected_teams, match_label, deck_size=None, rounds=None):
     """Crée un match manuel avec 2 ou 3 équipes sélectionnées."""
-    if len(selected_teams) < 2 or len(selected_teams) > 3:
-        return False, "Sélectionnez 2 ou 3 équipes pour le match."
-    if len(set(selected_teams)) != len(selected_teams):
-        return False, "Chaque équipe ne peut apparaître qu'une seule fois."
-
-    st.session_state.manual_match_counter += 1
-    mid = f"M{st.session_state.manual_match_counter}"
-
-    label = match_label.strip() if match_label.strip() else f"Match Manuel {st.session_state.manual_match_counter}"
-
-    st.session_state.matches[mid] = {
-        'teams': selected_teams,
-        'scores': {t: 0 for t in selected_teams},
-        'status': 'Prévu',
-        'type': 'manuel',
-        'label': label
-    }
-    st.session_state.match_progress[mid] = {"q_idx": 0}
+    error = validate_manual_teams(selected_teams)
+    if error:
+        return False, error
+
+    mid, match, counter, version = store_create_match(list(selected_teams), match_label.strip(), deck_size, rounds)
+    journal_event({"type": "create", "mid": mid, "match": match, "counter": counter}, version)
     return True, mid
 
 # --- SUPPRESSION D'UN MATCH MANUEL ---
 def delete_manual_match(mid):
     """Supprime un match manuel (uniquement si non terminé)."""
-    if mid in st.session_state.matches:
-        match = st.session_state.matches[mid]
-        if match.get('type') == 'manuel' and match['status'] != 'Terminé':
-            del st.session_state.matches[mid]
-            if mid in st.session_state.match_progress:
-                del st.session_state.match_progress[mid]
-            return True
-    return False
+    version = store_delete_match(mid)
+    if version is not None:
+        journal_event({"type": "delete", "mid": mid}, version)
+    return version is not None
 
-# --- CALCUL DES POINTS DE MATCH AVEC GESTION DES ÉGALITÉS ---
-def compute_match_points(scores):
+# --- CLASSEMENT INCRÉMENTAL ---
+def check_standings():
     """
-    Règles :
-      - 1 seul vainqueur          → 3 pts, 2ème → 1 pt, 3ème → 0 pt
-      - Égalité 1ère place (2 éq) → 1 pt chacune, 3ème → 0 pt
-      - Égalité 1ère place (3 éq) → 1 pt chacune
-      - 2ème et 3ème à égalité    → 1 pt chacune, 1er → 3 pts
-    Retourne un dict {equipe: points_match}
+    Compare le classement incrémental du modèle partagé à un recalcul complet.
+    Retourne la liste des écarts (vide si cohérent) ; s'il y en a, le modèle est relu entièrement.
     """
-    result = {t: 0 for t in scores}
-    sorted_scores = sorted(set(scores.values()), reverse=True)
-
-    rank1_score = sorted_scores[0]
-    rank1_teams = [t for t, s in scores.items() if s == rank1_score]
-
-    if len(rank1_teams) >= 2:
-        for t in rank1_teams:
-            result[t] = 1
-        return result
-
-    winner = rank1_teams[0]
-    result[winner] = 3
+    model = read_model()
+    fresh = compute_standings(model["setup"]["roster"]['teams'], model["matches"], model["player_scores"])
+    issues = standings_diff(model["standings"], fresh)
+    if issues:
+        drop_read_model(model)
+    return issues
+
+def award_points(mid, q_idx, team, player, pts):
+    """
+    Attribue des points à un joueur pour la question `q_idx` d'un match ; le classement
+    suit à la prochaine lecture du modèle. Retourne False si le match a été clôturé, ou
+    la question changée, entre-temps par un autre arbitre.
+    """
+    version = store_award(mid, q_idx, team, player, pts)
+    if version is not None:
+        journal_event({"type": "award", "mid": mid, "q_idx": q_idx, "team": team, "player": player, "pts": pts},
+                      version)
+    return version is not None
+
+def close_match(mid):
+    """Clôture un match ; ses points de match entrent dans le classement à la prochaine lecture du modèle."""
+    version = store_close(mid)
+    if version is not None:
+        journal_event({"type": "close", "mid": mid}, version)
+
+def advance_question(mid):
+    """Passe à la question suivante. Retourne False si un autre arbitre l'a déjà fait."""
+    version = store_advance(mid, read_model()["match_progress"][mid]["q_idx"])
+    if version is not None:
+        journal_event({"type": "next", "mid": mid}, version)
+    return version is not None
+
+# Store vide (base perdue ou premier lancement) : reprise depuis la sauvegarde automatique
+if store_version() == 0:
+    restored = load_autosave()
+    if restored is not None:
+        # expected=0 : si une autre session reprend en même temps, la première l'emporte
+        push_state(restored[0], 0, min_version=restored[1], history=restored[0].get("awards", []))
+
+# --- TABLEAU D'AFFICHAGE (SPECTATEURS) ---
+SPECTATOR_REFRESH = 2   # secondes entre deux vérifications de version
+BOARD_TEAMS = 20
+BOARD_PLAYERS = 10
+BOARD_LIVE = 6
+
+@st.cache_resource
+def get_scoreboard(store_path):
+    """Modèle d'affichage partagé par tous les écrans, recalculé une fois par version du store."""
+    return {"lock": threading.Lock(), "model": None}
+
+def _board_table(df, limit):
+    head = "".join(f"<th>{html.escape(str(c))}</th>" for c in ["#"] + list(df.columns))
+    rows = "".join(
+        "<tr>" + "".join(f"<td>{html.escape(str(v))}</td>" for v in (rank, *row)) + "</tr>"
+        for rank, row in zip(df.index[:limit], df.head(limit).itertuples(index=False))
+    )
+    return f"<table><tr>{head}</tr>{rows}</table>"
+
+@profiled
+def build_scoreboard(model):
+    """Classements et matchs en cours du modèle partagé, rendus une fois en HTML pour tous les spectateurs."""
+    roster, bank = model["setup"]["roster"], model["setup"]["bank"]
+    df_r, df_p = standings_tables(model["standings"], roster)
+
+    live = []
+    for mid, m in model["matches"].items():
+        q_idx = model["match_progress"].get(mid, {}).get("q_idx", 0)
+        if m['status'] == 'Terminé' or not (q_idx or any(m['scores'].values())):
+            continue
+        scores = " — ".join(f"{html.escape(t)} <b>{sc}</b>" for t, sc in m['scores'].items())
+        question = ""
+        pos = deck_position(bank, m.get('deck'), q_idx)
+        if pos is not None:
+            q = bank_question(bank, pos)
+            question = f"<br>Question n°{q_idx + 1} · {html.escape(str(q['Manche']))} — {html.escape(str(q['Rubrique']))}"
+        live.append(f"<div class='board-live'>{html.escape(m.get('label', f'Match {mid}'))}<br>{scores}{question}</div>")
+        if len(live) == BOARD_LIVE:
+            break
+
+    body = (
+        "<div class='board'><div><h3>🏆 Équipes</h3>" + _board_table(df_r, BOARD_TEAMS) + "</div>"
+        "<div><h3>🔴 En direct</h3>" + ("".join(live) or "<p>Aucun match en cours.</p>")
+        + "<h3>🥇 Joueurs</h3>" + _board_table(df_p, BOARD_PLAYERS) + "</div></div>"
+    )
+    return {"version": model["version"], "html": body, "updated": datetime.now().strftime("%H:%M:%S")}
+
+def scoreboard_model():
+    """Une lecture de version par rafraîchissement ; un seul rendu par nouvelle version, tous écrans confondus."""
+    board = get_scoreboard(STORE_PATH)
+    model = read_model()
+    shown = board["model"]
+    if shown is None or shown["version"] != model["version"]:
+        with board["lock"]:
+            shown = board["model"]
+            if shown is None or shown["version"] != model["version"]:
+                shown = board["model"] = build_scoreboard(model)
+    return shown
+
+@st.fragment(run_every=SPECTATOR_REFRESH)
+@profiled_fragment("Tableau d'affichage (rafraîchissement)")
+def spectator_board():
+    model = scoreboard_model()
+    st.markdown(model["html"], unsafe_allow_html=True)
+    st.caption(f"Mis à jour à {model['updated']} · version {model['version']}")
+
+# Écran spectateur (?vue=spectateur) : lecture seule, sans session d'arbitrage
+if st.query_params.get("vue") == "spectateur":
+    with measured_rerun("Tableau d'affichage"):
+        st.title("📺 Tournoi en direct")
+        spectator_board()
+    st.stop()
+
+# --- PROJECTIONS ---
+@profiled
+@st.cache_data(max_entries=8, show_spinner="Simulation des matchs restants...")
+def project_rankings(version, n_sims, teams, _matches, _progress, _bank):
+    """Probabilités de rang (Monte Carlo), recalculées seulement quand le store change de version."""
+    decks = {mid: deck_positions(_bank, m['deck']) for mid, m in _matches.items() if m.get('deck')}
+    return simulate_rankings(_matches, _progress, teams, _bank['points'], n_sims, seed=version, decks=decks)
+
+# --- EXPORTS DES RÉSULTATS (EN ARRIÈRE-PLAN) ---
+EXPORT_FORMATS = {
+    "Excel (XLSX)": (".xlsx", write_xlsx, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "CSV (ZIP)": (".csv.zip", write_csv_zip, "application/zip"),
+    "Parquet (ZIP)": (".parquet.zip", write_parquet_zip, "application/zip"),
+}
+EXPORT_POLL = 1  # secondes entre deux vérifications d'un export en cours
+EXPORT_GRACE = 600  # secondes pendant lesquelles un export remplacé reste téléchargeable
+
+@st.cache_resource
+def get_exports(store_path):
+    """
+    Un fil d'export par base : les fichiers sont produits hors des reruns, et
+    le dernier de chaque format est réutilisé tant que la version du store ne change pas.
+    """
+    return {"lock": threading.Lock(), "pool": ThreadPoolExecutor(max_workers=1, thread_name_prefix="export"), "jobs": {},
+            "stale": []}
 
-    if len(sorted_scores) >= 2:
-        rank2_score = sorted_scores[1]
-        rank2_teams = [t for t, s in scores.items() if s == rank2_score]
-        for t in rank2_teams:
-            result[t] = 1
+def _exports_path(name):
+    return os.path.join(AUTOSAVE_DIR, "exports", name)
 
-    return result
+def run_export(fmt, setup):
+    """
+    Dans le fil d'export (sans session) : lit le store dans une seule transaction
+    avec sa propre connexion et écrit le fichier au fil des lignes, sans le
+    construire en mémoire. Retourne (chemin, version exportée).
+    """
+    ext, writer, _ = EXPORT_FORMATS[fmt]
+    conn = _connect(STORE_PATH)
+    try:
+        conn.execute("BEGIN")
+        state, version, _ = _read_state(conn, setup["id"][1])
+        awards = conn.execute("SELECT mid, q_idx, team, player, pts FROM awards ORDER BY version")
+        path = _exports_path(f"resultats_v{version}{ext}")
+        writer(path + ".tmp", export_tables(state, setup["roster"], setup["bank"], awards))
+        os.replace(path + ".tmp", path)
+    finally:
+        conn.close()
+    return path, version
+
+def _discard_export(stale, future):
+    """
+    Programme la suppression du fichier d'un export remplacé : d'autres sessions
+    affichent peut-être encore son bouton de téléchargement.
+    """
+    if future.exception() is None:
+        stale.append((time.monotonic() + EXPORT_GRACE, future.result()[0]))
+
+def _prune_exports(stale):
+    """Supprime les fichiers remplacés depuis plus de EXPORT_GRACE secondes."""
+    now = time.monotonic()
+    for item in [item for item in stale if item[0] <= now]:
+        stale.remove(item)
+        try:
+            os.remove(item[1])
+        except FileNotFoundError:
+            pass
+
+def request_export(fmt):
+    """Export de la version courante du store : celui déjà lancé s'il existe, sinon un nouveau."""
+    exports = get_exports(STORE_PATH)
+    version = store_version()
+    setup = read_model()["setup"]
+    with exports["lock"]:
+        job = exports["jobs"].get(fmt)
+        if job is None or job["version"] != version:
+            if job is not None:
+                job["future"].add_done_callback(partial(_discard_export, exports["stale"]))
+            _prune_exports(exports["stale"])
+            os.makedirs(_exports_path(""), exist_ok=True)
+            job = exports["jobs"][fmt] = {"version": version, "future": exports["pool"].submit(run_export, fmt, setup)}
+    return job
+
+def _read_file(path, fmt):
+    """Fichier d'export ; s'il a été supprimé depuis l'affichage, celui de l'export courant du format."""
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        path, _ = get_exports(STORE_PATH)["jobs"][fmt]["future"].result()
+        with open(path, "rb") as f:
+            return f.read()
+
+@st.fragment(run_every=EXPORT_POLL)
+@profiled_fragment("Exports (suivi)")
+def export_progress(fmt):
+    """Vérifie l'export en cours sans relancer la page ; rerun complet quand il est prêt."""
+    if get_exports(STORE_PATH)["jobs"][fmt]["future"].done():
+        st.rerun()
+    st.info("⏳ Export en cours : la console reste utilisable, le fichier apparaîtra ici.")
+
+def export_panel():
+    """Choix du format, lancement en arrière-plan et téléchargement du dernier export."""
+    fmt = st.radio("Format", list(EXPORT_FORMATS), horizontal=True, key="export_format")
+    ext, _, mime = EXPORT_FORMATS[fmt]
+    version = read_model()["version"]
+    job = get_exports(STORE_PATH)["jobs"].get(fmt)
+    if job is None or job["version"] != version:
+        if st.button(f"⚙️ Préparer l'export (version {version})", key="export_start"):
+            job = request_export(fmt)
+    if job is None:
+        st.caption("Classements, détail des matchs et points attribués question par question.")
+        return
+    future = job["future"]
+    if not future.done():
+        export_progress(fmt)
+    elif future.exception() is not None:
+        st.error(f"Échec de l'export : {future.exception()}")
+    else:
+        path, exported = future.result()
+        if exported != version:
+            st.caption(f"Dernier export : version {exported} du store (actuelle : {version}).")
+        st.download_button(f"📥 Télécharger ({fmt})", partial(_read_file, path, fmt),
+                           f"resultats_{datetime.now().strftime('%d%m_%H%M')}{ext}", mime=mime, key="export_download")
+
+# --- CHRONO (CÔTÉ NAVIGATEUR) ---
+CHRONO_TEMPLATE = """
+<!-- chrono {chrono_id} -->
+<div style="font-family: sans-serif; text-align: center;">
+  <div id="display" style="font-size: 2.4em; font-weight: bold; color: #1e3a8a;">{duration}s</div>
+  <div style="display: flex; gap: 6px; justify-content: center; margin-top: 6px;">
+    <button id="start">▶ Lancer</button>
+    <button id="pause">⏸ Pause</button>
+    <button id="reset">↺ Reset</button>
+  </div>
+</div>
+<script>
+  const duration = {duration};
+  let remaining = duration * 1000, deadline = null, ticker = null;
+  const display = document.getElementById("display");
+  function paint() {{
+    const s = Math.max(0, Math.ceil(remaining / 1000));
+    display.textContent = s > 0 ? s + "s" : "FIN !";
+    display.style.color = s > 0 ? "#1e3a8a" : "#dc2626";
+  }}
+  function tick() {{
+    remaining = deadline - Date.now();
+    if (remaining <= 0) {{ remaining = 0; stop(); }}
+    paint();
+  }}
+  function stop() {{ clearInterval(ticker); ticker = null; deadline = null; }}
+  document.getElementById("start").onclick = () => {{
+    if (ticker || remaining <= 0) return;
+    deadline = Date.now() + remaining;
+    ticker = setInterval(tick, 200);
+  }};
+  document.getElementById("pause").onclick = () => {{ if (ticker) {{ tick(); stop(); }} }};
+  document.getElementById("reset").onclick = () => {{ stop(); remaining = duration * 1000; paint(); }};
+</script>
+"""
+
+def render_chrono(duration, chrono_id):
+    """
+    Affiche un compte à rebours exécuté dans le navigateur : aucun thread serveur
+    n'est occupé et les reruns (attribution de points) ne l'interrompent pas
+    tant que le couple (chrono_id, duration) reste identique.
+    """
+    st.iframe(CHRONO_TEMPLATE.format(chrono_id=chrono_id, duration=int(duration)), height=110)
 
 def get_match_display_name(mid, data):
     """Retourne le nom d'affichage d'un match."""
@@ -156,6 +1311,135 @@ def get_match_display_name(mid, data):
         return f"Match {mid} — {label} : {teams_str}{badge}"
     return f"Match {mid} : {teams_str}{badge}"
 
+# --- CONSOLE D'ARBITRAGE : PANNEAU DE SCORE ---
+def _next_question(m_id):
+    if not advance_question(m_id):
+        st.toast("Question déjà changée par un autre arbitre.")
+
+@st.fragment
+@profiled_fragment("Console d'Arbitrage (panneau de score)")
+def scoring_panel(m_id):
+    """
+    Question courante, boutons de score, chrono, navigation et tableau des scores.
+    Un clic ne relance que ce fragment : la barre latérale, l'en-tête et la
+    sélection du match ne sont pas recalculés, et seule la question courante
+    est lue dans la banque (en O(1), via le paquet du match).
+    """
+    model = read_model()
+    m_data = model["matches"].get(m_id)
+    if m_data is None or m_data['status'] == 'Terminé':
+        st.warning("Ce match a été clôturé ou supprimé par un autre arbitre.")
+        if st.button("🔄 Actualiser", key=f"stale_{m_id}"):
+            st.rerun()
+        return
+
+    bank = model["setup"]["bank"]
+    curr_idx = model["match_progress"][m_id]["q_idx"]
+    pos = deck_position(bank, m_data.get('deck'), curr_idx)
+
+    if pos is not None:
+        q = bank_question(bank, pos)
+        st.subheader(f"📍 {q['Manche']} — {q['Rubrique']}")
+        if q['Consigne'] is not None:
+            st.markdown(f"<div class='instruction-box'>{q['Consigne']}</div>", unsafe_allow_html=True)
+
+        st.markdown(f"<div class='question-box'><b>Question n°{curr_idx + 1} / {deck_length(bank, m_data.get('deck'))} :</b><br>{q['Question']}</div>", unsafe_allow_html=True)
+        pts_val = q['Points']
+        temps_val = q['Temps']
+        st.write(f"Points : **{pts_val}** | Temps : **{temps_val}s**")
+
+        c_score, c_nav = st.columns([2, 1])
+        roster = model["setup"]["roster"]
+        with c_score:
+            cols = st.columns(len(m_data['teams']))
+            for i, team in enumerate(m_data['teams']):
+                with cols[i]:
+                    st.markdown(f"**{team}**")
+                    for p in roster['team_players'].get(team, []):
+                        name = roster['player_name'][p]
+                        if st.button(f"🎯 {name}", key=f"p_{m_id}_{p}_{curr_idx}"):
+                            if award_points(m_id, curr_idx, team, p, pts_val):
+                                st.toast(f"+{pts_val} pour {name}")
+                            else:
+                                st.toast("Point non attribué : match clôturé ou question changée par un autre arbitre.")
+
+        with c_nav:
+            st.write("⏱️ **Chrono**")
+            render_chrono(temps_val, f"{m_id}_{curr_idx}")
+            st.divider()
+            # callback : la question suivante s'affiche dès ce rerun du fragment
+            st.button("Suivant ➡️", type="primary", on_click=_next_question, args=(m_id,))
+    else:
+        st.success("Questions terminées pour ce match.")
+
+    st.divider()
+    m_data = read_model()["matches"].get(m_id, m_data)
+    sc_cols = st.columns(len(m_data['teams']))
+    for i, t in enumerate(m_data['teams']):
+        sc_cols[i].metric(t, f"{m_data['scores'][t]} pts")
+
+# --- PAQUETS DE QUESTIONS (RÉGLAGES) ---
+def deck_settings(key, n_matches, existing=None):
+    """
+    Manches et nombre de questions des paquets à attribuer à `n_matches` match(s).
+    Retourne (taille, manches) ; (None, None) : le match parcourt toute la banque dans l'ordre.
+    """
+    bank = read_model()["setup"]["bank"]
+    if not bank['size']:
+        st.caption("Sans banque de questions, les matchs parcourront la banque importée plus tard, dans l'ordre.")
+        return None, None
+    c_rounds, c_size = st.columns([2, 1])
+    with c_rounds:
+        rounds = st.multiselect("Manches tirées", bank['round_labels'], key=f"{key}_rounds",
+                                placeholder="Toutes les manches")
+    with c_size:
+        size = st.number_input("Questions par match", min_value=0, max_value=bank['size'],
+                               value=min(DEFAULT_DECK_SIZE, bank['size']), key=f"{key}_deck_size",
+                               help="Questions tirées au hasard, sans répétition d'un match à l'autre. "
+                                    "0 : toute la banque, dans l'ordre du fichier.")
+    if not size:
+        return None, None
+    pool = sum(len(bank['by_round'][r]) for r in rounds) if rounds else bank['size']
+    same = sorted(rounds) if rounds else None
+    used = sum(m['deck']['size'] for m in (existing or {}).values() if m.get('deck') and m['deck']['rounds'] == same)
+    if used + size * n_matches > pool:
+        st.warning(f"{pool} question(s) disponible(s) dans ces manches : "
+                   "certaines seront reposées une fois la réserve épuisée.")
+    return int(size), rounds or None
+
+# --- LISTES DE MATCHS (FILTRES + PAGINATION) ---
+PAGE_SIZE = 12
+STATUS_FILTERS = {"Tous": None, "À jouer": False, "Terminés": True}
+TYPE_FILTERS = {"Tous": None, "Calendrier": "auto", "Manuels": "manuel"}
+
+def match_filters(key, m_type=None):
+    """Filtres statut / type / équipe. Retourne les identifiants des matchs retenus."""
+    cols = st.columns(3 if m_type is None else 2)
+    finished = STATUS_FILTERS[cols[0].selectbox("Statut", list(STATUS_FILTERS), key=f"{key}_status")]
+    if m_type is None:
+        m_type = TYPE_FILTERS[cols[1].selectbox("Type", list(TYPE_FILTERS), key=f"{key}_type")]
+    model = read_model()
+    team = cols[-1].selectbox("Équipe", ["Toutes"] + model["setup"]["roster"]['teams'], key=f"{key}_team")
+    return filter_matches(model["matches"], finished, m_type, None if team == "Toutes" else team)
+
+def paginate(mids, key, page_size=PAGE_SIZE):
+    """Tranche de `mids` pour la page choisie : le rendu reste borné par la taille de page."""
+    n_pages = max(1, -(-len(mids) // page_size))
+    page = 1
+    if n_pages > 1:
+        page = st.number_input(f"Page (sur {n_pages})", min_value=1, max_value=n_pages, value=1, key=f"{key}_page")
+    start = (page - 1) * page_size
+    shown = mids[start:start + page_size]
+    if shown:
+        st.caption(f"{len(mids)} match(s) — affichage {start + 1} à {start + len(shown)}")
+    return shown
+
+def _scores_md(scores, points=None):
+    """Scores (et points de match) en une seule liste Markdown."""
+    if points is None:
+        return "\n".join(f"- {t} : {s} pts" for t, s in scores.items())
+    return "\n".join(f"- {t} : {s} pts → **{points[t]} pt(s) match**" for t, s in scores.items())
+
 # --- NAVIGATION ---
 st.sidebar.title("🏆 Tournament Manager")
 page = st.sidebar.radio("Navigation", [
@@ -165,346 +1449,392 @@ page = st.sidebar.radio("Navigation", [
     "Console d'Arbitrage",
     "Classement Général"
 ])
-
-# --- PAGE 1 : SETUP ---
-if page == "Configuration & Sauvegarde":
-    st.title("📂 Paramètres du Tournoi")
-
-    tab_import, tab_json = st.tabs(["📥 Importation des Fichiers", "💾 Sauvegarde JSON"])
-
-    with tab_import:
-        st.markdown("""
-        <div class='format-info'>
-        <b>Structure imposée pour le fichier Questions :</b><br>
-        Colonnes : <code>Manche</code>, <code>Rubrique</code>, <code>Question</code>, <code>Points</code>, <code>Temps</code>, <code>Consigne</code>
-        </div>
-        """, unsafe_allow_html=True)
-
-        c1, c2 = st.columns(2)
-        with c1:
-            st.subheader("👥 Equipes et Joueurs")
-            f_teams = st.file_uploader("Fichier Equipes (CSV/XLSX)", type=['csv', 'xlsx'])
-            if f_teams:
-                df = pd.read_csv(f_teams, sep=None, engine='python') if f_teams.name.endswith('.csv') else pd.read_excel(f_teams)
-                st.session_state.teams_df = df
-                for p in df['Joueur'].unique():
-                    if p not in st.session_state.player_scores: st.session_state.player_scores[p] = 0
-                st.success(f"{len(df['Equipe'].unique())} équipes chargées.")
-
-        with c2:
-            st.subheader("❓ Banque de Questions")
-            f_q = st.file_uploader("Fichier Questions (Format Imposé)", type=['csv', 'xlsx'])
-            if f_q:
-                df_q = pd.read_csv(f_q, sep=None, engine='python') if f_q.name.endswith('.csv') else pd.read_excel(f_q)
-                required = ['Manche', 'Rubrique', 'Question', 'Points', 'Temps']
-                if all(col in df_q.columns for col in required):
-                    st.session_state.questions_df = df_q
-                    st.success(f"{len(df_q)} questions chargées.")
-                else:
-                    st.error(f"Colonnes manquantes. Requis : {', '.join(required)}")
-
-    with tab_json:
-        st.subheader("💾 Gestion de la session")
-        st.download_button("📥 Exporter Sauvegarde (JSON)", export_state_json(), f"tournoi_save_{datetime.now().strftime('%d%m_%H%M')}.json")
-        st.divider()
-        f_json = st.file_uploader("Restaurer fichier JSON", type=['json'])
-        if f_json and st.button("Valider l'importation"):
-            import_state_json(f_json)
-
-# --- PAGE 2 : CALENDRIER ---
-elif page == "Calendrier":
-    st.title("📅 Calendrier")
-    if st.session_state.teams_df.empty:
-        st.warning("Veuillez d'abord importer les équipes.")
-    else:
-        teams = sorted(st.session_state.teams_df['Equipe'].unique().tolist())
-        if st.button("🚀 Générer les 6 matchs automatiques"):
-            generate_schedule(teams)
-            st.success("Calendrier généré !")
-
-        if st.session_state.matches:
-            auto_matches = {mid: d for mid, d in st.session_state.matches.items() if d.get('type', 'auto') == 'auto'}
-            manual_matches = {mid: d for mid, d in st.session_state.matches.items() if d.get('type') == 'manuel'}
-
-            if auto_matches:
-                st.subheader("🔵 Matchs du Calendrier")
-                cols = st.columns(3)
-                for i, (mid, d) in enumerate(auto_matches.items()):
-                    with cols[i % 3]:
-                        status_color = "✅" if d['status'] == 'Terminé' else "⏳"
-                        st.info(f"**MATCH {mid}** {status_color}\n\n{' vs '.join(d['teams'])}\n\nStatut : {d['status']}")
-
-            if manual_matches:
-                st.subheader("🟣 Matchs Manuels")
-                cols = st.columns(3)
-                for i, (mid, d) in enumerate(manual_matches.items()):
-                    with cols[i % 3]:
-                        status_color = "✅" if d['status'] == 'Terminé' else "⏳"
-                        label = d.get('label', mid)
-                        st.info(f"**{label}** [{mid}] {status_color}\n\n{' vs '.join(d['teams'])}\n\nStatut : {d['status']}")
-
-# --- PAGE 3 : MATCHS MANUELS ---
-elif page == "Matchs Manuels":
-    st.title("🟣 Gestion des Matchs Manuels")
-
-    if st.session_state.teams_df.empty:
-        st.warning("Veuillez d'abord importer les équipes.")
-    else:
-        teams_list = sorted(st.session_state.teams_df['Equipe'].unique().tolist())
-
-        st.markdown("""
-        <div class='format-info'>
-        <b>ℹ️ Les matchs manuels comptent dans le classement général</b> (Points Match + Total Quiz) exactement comme les matchs du calendrier automatique.
-        </div>
-        """, unsafe_allow_html=True)
-
-        st.subheader("➕ Créer un nouveau match")
-
-        # --- Choix du nombre d'équipes HORS du form pour que les selectbox se mettent à jour dynamiquement ---
-        col_label, col_nb = st.columns([2, 1])
-        with col_label:
-            match_label = st.text_input(
-                "Nom du match (optionnel)",
-                placeholder="Ex : Finale, Demi-finale A, Match de barrage...",
-                key="match_label_input"
+st.sidebar.markdown("[📺 Tableau d'affichage (spectateurs)](?vue=spectateur)")
+_rerun["page_start"] = time.perf_counter()
+
+# Corps de la page : mesuré même s'il se termine par st.rerun(), st.stop() ou une exception
+with measured_rerun(page):
+    # Une référence au modèle partagé par rerun ; relue après les écritures de la page
+    model = read_model()
+
+    # --- PAGE 1 : SETUP ---
+    if page == "Configuration & Sauvegarde":
+        st.title("📂 Paramètres du Tournoi")
+
+        tab_import, tab_json, tab_perf = st.tabs(["📥 Importation des Fichiers", "💾 Sauvegarde JSON", "⏱️ Performances"])
+
+        with tab_import, profile_section("onglet : importation"):
+            st.markdown("""
+            <div class='format-info'>
+            <b>Structure imposée pour le fichier Questions :</b><br>
+            Colonnes : <code>Manche</code>, <code>Rubrique</code>, <code>Question</code>, <code>Points</code>, <code>Temps</code>, <code>Consigne</code>
+            </div>
+            """, unsafe_allow_html=True)
+
+            c1, c2 = st.columns(2)
+            with c1:
+                st.subheader("👥 Equipes et Joueurs")
+                f_teams = st.file_uploader("Fichier Equipes (CSV/XLSX)", type=['csv', 'xlsx'])
+                if f_teams:
+                    digest = file_digest(f_teams)
+                    if digest != st.session_state.get('teams_digest'):
+                        df, errors, warnings = parse_teams_file(digest, f_teams.name, f_teams.getvalue())
+                        for w in warnings:
+                            st.warning(w)
+                        if errors:
+                            st.error(" ".join(errors))
+                        elif push_setup(teams_df=df):
+                            st.session_state.teams_digest = digest
+                        else:
+                            st.error("Imports simultanés depuis plusieurs sessions : réessayer.")
+                    if digest == st.session_state.get('teams_digest'):
+                        st.success(f"{len(read_model()['setup']['roster']['teams'])} équipes chargées.")
+
+            with c2:
+                st.subheader("❓ Banque de Questions")
+                f_q = st.file_uploader("Fichier Questions (Format Imposé)", type=['csv', 'xlsx'])
+                if f_q:
+                    digest = file_digest(f_q)
+                    if digest != st.session_state.get('questions_digest'):
+                        df_q, errors, _ = parse_questions_file(digest, f_q.name, f_q.getvalue())
+                        if errors:
+                            st.error(" ".join(errors))
+                        elif push_setup(questions_df=df_q):
+                            st.session_state.questions_digest = digest
+                        else:
+                            st.error("Imports simultanés depuis plusieurs sessions : réessayer.")
+                    if digest == st.session_state.get('questions_digest'):
+                        st.success(f"{len(read_model()['setup']['questions_df'])} questions chargées.")
+
+        with tab_json, profile_section("onglet : sauvegarde"):
+            st.subheader("💾 Gestion de la session")
+            # Sérialisation différée au clic (et non à chaque affichage de la page)
+            stamp = datetime.now().strftime('%d%m_%H%M')
+            metrics = get_metrics(AUTOSAVE_DIR)
+            st.download_button("📥 Sauvegarde complète (compressée)",
+                               partial(timed_download, "Téléchargement : sauvegarde complète", metrics,
+                                       export_full_save, _state_refs(), setup_blobs(), _full_save_ref()),
+                               f"tournoi_save_{stamp}.tournoi", mime="application/gzip")
+            st.download_button("📄 Exporter au format JSON (lisible)",
+                               partial(timed_download, "Téléchargement : JSON", metrics, state_to_json, _state_refs()),
+                               f"tournoi_save_{stamp}.json")
+            st.caption("Après une sauvegarde complète, chaque fin de match propose une sauvegarde différentielle : "
+                       "pour restaurer, joindre la complète et la dernière différentielle.")
+            autosave = get_autosave(AUTOSAVE_DIR)
+            last = autosave.get("snapshot_time")
+            st.caption(
+                f"Base partagée `{STORE_PATH}` (version {read_model()['version']}). "
+                f"Sauvegarde automatique dans `{AUTOSAVE_DIR}/` : {autosave['since_snapshot']} événement(s) journalisé(s) "
+                f"depuis le dernier instantané" + (f" ({last.strftime('%H:%M:%S')})." if last else ".")
             )
-        with col_nb:
-            nb_teams = st.radio(
-                "Nombre d'équipes",
-                [2, 3],
-                horizontal=True,
-                key="nb_teams_radio"
+            if "error" in autosave:
+                st.warning(f"Dernière compaction automatique en échec ({autosave['error']}) : créer un instantané manuellement.")
+            if st.button("📸 Créer un instantané maintenant"):
+                write_snapshot()
+                st.success("Instantané enregistré.")
+            st.divider()
+            f_json = st.file_uploader("Restaurer une sauvegarde (JSON, ou complète + différentielle)",
+                                      type=['json', 'tournoi'], accept_multiple_files=True)
+            if f_json and st.button("Valider l'importation"):
+                import_state_json(f_json)
+
+        with tab_perf:
+            metrics = get_metrics(AUTOSAVE_DIR)
+            st.subheader("⏱️ Durée des reruns")
+            st.caption(
+                f"Percentiles sur les {ROLLING_WINDOW} dernières mesures de ce processus, toutes sessions confondues. "
+                f"Métriques Prometheus dans `{_autosave_path('metrics.prom')}`, "
+                f"reruns lents dans `{_autosave_path('slow_reruns.log')}`."
             )
-
-        # --- Selectbox dynamiques selon nb_teams, avec clé incluant nb_teams ---
-        team_options = ["— Choisir —"] + teams_list
-        st.write(f"**Sélectionner {nb_teams} équipes :**")
-        team_cols = st.columns(nb_teams)
-        selected = []
-
-        for i in range(nb_teams):
-            with team_cols[i]:
-                choice = st.selectbox(
-                    f"Équipe {i+1}",
-                    team_options,
-                    key=f"team_select_{nb_teams}_{i}"   # ← clé dynamique incluant nb_teams
+            st.number_input(
+                "Seuil de rerun lent (ms)", min_value=0.0, step=50.0, value=metrics["slow_ms"], key="slow_ms",
+                on_change=_set_slow_ms, help="Commun à toutes les sessions de ce processus."
+            )
+            df_pages, df_sections = metrics_tables(metrics)
+            st.dataframe(df_pages.style.format(precision=1), width="stretch", hide_index=True)
+            st.markdown("**Sections et fonctions** (temps cumulé par rerun)")
+            st.dataframe(df_sections.sort_values("p95 (ms)", ascending=False).style.format(precision=1),
+                         width="stretch", hide_index=True)
+            if st.button("🧹 Réinitialiser les mesures"):
+                with metrics["lock"]:
+                    for key in ("pages", "sections", "slow"):
+                        metrics[key].clear()
+                st.rerun()
+
+    # --- PAGE 2 : CALENDRIER ---
+    elif page == "Calendrier":
+        st.title("📅 Calendrier")
+        if model["setup"]["teams_df"].empty:
+            st.warning("Veuillez d'abord importer les équipes.")
+        else:
+            teams = model["setup"]["roster"]['teams']
+            c_rounds, c_size, c_duels = st.columns(3)
+            with c_rounds:
+                n_rounds = st.number_input("Nombre de tours", min_value=1, max_value=100, value=2)
+            with c_size:
+                group_size = st.radio("Équipes par match", [3, 2], horizontal=True)
+            with c_duels:
+                duels = st.checkbox(
+                    "Compléter par des matchs à 2 plutôt qu'exempter",
+                    disabled=group_size == 2,
+                    help="Quand le nombre d'équipes n'est pas multiple de 3."
                 )
-                selected.append(choice)
-
-        # --- Bouton de création ---
-        if st.button("🚀 Créer le match", type="primary", key="create_match_btn"):
-            filtered = [t for t in selected if t != "— Choisir —"]
-            if len(filtered) < nb_teams:
-                st.error(f"Veuillez sélectionner {nb_teams} équipes.")
-            elif len(set(filtered)) != len(filtered):
-                st.error("Chaque équipe doit être différente.")
-            else:
-                ok, result = create_manual_match(filtered, match_label)
-                if ok:
-                    label_display = match_label.strip() if match_label.strip() else result
-                    st.success(f"✅ Match **{label_display}** [{result}] créé avec {' vs '.join(filtered)} !")
-                    st.rerun()
+            deck_size, deck_rounds = deck_settings("cal", int(n_rounds) * max(1, len(teams) // group_size))
+            if st.button(f"🚀 Générer le calendrier ({len(teams)} équipes)"):
+                stats = generate_schedule(teams, int(n_rounds), group_size, duels and group_size == 3, deck_size, deck_rounds)
+                if stats:
+                    st.success(
+                        f"Calendrier généré ! Matchs par équipe : {stats['min_played']} à {stats['max_played']} — "
+                        f"confrontations répétées au plus {stats['max_repeat']} fois."
+                    )
+                    model = read_model()
+
+            if model["matches"]:
+                st.subheader("🗓️ Matchs")
+                mids = match_filters("cal")
+                view = st.radio("Affichage", ["Cartes", "Tableau"], horizontal=True, key="cal_view")
+                if view == "Tableau":
+                    st.dataframe(matches_table(model["matches"], mids), width="stretch", hide_index=True)
                 else:
-                    st.error(result)
+                    cols = st.columns(3)
+                    for i, mid in enumerate(paginate(mids, "cal")):
+                        d = model["matches"][mid]
+                        with cols[i % 3]:
+                            status_color = "✅" if d['status'] == 'Terminé' else "⏳"
+                            if d.get('type') == 'manuel':
+                                title = f"🟣 **{d.get('label', mid)}** [{mid}]"
+                            else:
+                                title = f"🔵 **MATCH {mid}**" + (f" — Tour {d['round']}" if 'round' in d else "")
+                            st.info(f"{title} {status_color}\n\n{' vs '.join(d['teams'])}\n\nStatut : {d['status']}")
+
+    # --- PAGE 3 : MATCHS MANUELS ---
+    elif page == "Matchs Manuels":
+        st.title("🟣 Gestion des Matchs Manuels")
+
+        if model["setup"]["teams_df"].empty:
+            st.warning("Veuillez d'abord importer les équipes.")
+        else:
+            teams_list = model["setup"]["roster"]['teams']
+
+            st.markdown("""
+            <div class='format-info'>
+            <b>ℹ️ Les matchs manuels comptent dans le classement général</b> (Points Match + Total Quiz) exactement comme les matchs du calendrier automatique.
+            </div>
+            """, unsafe_allow_html=True)
+
+            st.subheader("➕ Créer un nouveau match")
+
+            # --- Choix du nombre d'équipes HORS du form pour que les selectbox se mettent à jour dynamiquement ---
+            col_label, col_nb = st.columns([2, 1])
+            with col_label:
+                match_label = st.text_input(
+                    "Nom du match (optionnel)",
+                    placeholder="Ex : Finale, Demi-finale A, Match de barrage...",
+                    key="match_label_input"
+                )
+            with col_nb:
+                nb_teams = st.radio(
+                    "Nombre d'équipes",
+                    [2, 3],
+                    horizontal=True,
+                    key="nb_teams_radio"
+                )
 
-        st.divider()
+            # --- Selectbox dynamiques selon nb_teams, avec clé incluant nb_teams ---
+            team_options = ["— Choisir —"] + teams_list
+            st.write(f"**Sélectionner {nb_teams} équipes :**")
+            team_cols = st.columns(nb_teams)
+            selected = []
+
+            for i in range(nb_teams):
+                with team_cols[i]:
+                    choice = st.selectbox(
+                        f"Équipe {i+1}",
+                        team_options,
+                        key=f"team_select_{nb_teams}_{i}"   # ← clé dynamique incluant nb_teams
+                    )
+                    selected.append(choice)
+
+            deck_size, deck_rounds = deck_settings("manual", 1, model["matches"])
+
+            # --- Bouton de création ---
+            if st.button("🚀 Créer le match", type="primary", key="create_match_btn"):
+                filtered = [t for t in selected if t != "— Choisir —"]
+                if len(filtered) < nb_teams:
+                    st.error(f"Veuillez sélectionner {nb_teams} équipes.")
+                elif len(set(filtered)) != len(filtered):
+                    st.error("Chaque équipe doit être différente.")
+                else:
+                    ok, result = create_manual_match(filtered, match_label, deck_size, deck_rounds)
+                    if ok:
+                        label_display = match_label.strip() if match_label.strip() else result
+                        st.success(f"✅ Match **{label_display}** [{result}] créé avec {' vs '.join(filtered)} !")
+                        st.rerun()
+                    else:
+                        st.error(result)
 
-        # --- Liste des matchs manuels existants ---
-        manual_matches = {mid: d for mid, d in st.session_state.matches.items() if d.get('type') == 'manuel'}
+            st.divider()
 
-        if not manual_matches:
-            st.info("Aucun match manuel créé pour l'instant.")
-        else:
-            st.subheader(f"📋 Matchs manuels existants ({len(manual_matches)})")
-
-            for mid, data in manual_matches.items():
-                label = data.get('label', mid)
-                status = data['status']
-                teams_str = ' vs '.join(data['teams'])
-                status_icon = "✅" if status == 'Terminé' else "⏳"
-
-                with st.expander(f"{status_icon} **{label}** [{mid}] — {teams_str} — {status}"):
-                    col_info, col_scores, col_action = st.columns([2, 2, 1])
-
-                    with col_info:
-                        st.write(f"**Équipes :** {teams_str}")
-                        st.write(f"**Statut :** {status}")
-                        st.write(f"**Format :** {len(data['teams'])} équipes")
-
-                    with col_scores:
-                        if status == 'Terminé':
-                            st.write("**Scores finaux :**")
-                            for t, s in data['scores'].items():
-                                st.write(f"• {t} : {s} pts")
-                            mp = compute_match_points(data['scores'])
-                            st.write("**Points match attribués :**")
-                            for t, p in mp.items():
-                                st.write(f"• {t} : {p} pts")
-                        else:
-                            st.write("*Match non encore joué*")
-
-                    with col_action:
-                        if status != 'Terminé':
-                            if st.button(f"🗑️ Supprimer", key=f"del_{mid}"):
-                                if delete_manual_match(mid):
-                                    st.success("Match supprimé.")
-                                    st.rerun()
-                        else:
-                            st.write("*(terminé)*")
-
-# --- PAGE 4 : ARBITRAGE ---
-elif page == "Console d'Arbitrage":
-    if not st.session_state.matches:
-        st.error("Générez le calendrier ou créez des matchs manuels d'abord.")
-    elif st.session_state.questions_df.empty:
-        st.error("Importez les questions d'abord.")
-    else:
-        available_matches = [mid for mid, data in st.session_state.matches.items() if data['status'] != 'Terminé']
+            # --- Liste des matchs manuels existants ---
+            n_manual = len(filter_matches(model["matches"], m_type='manuel'))
 
-        if not available_matches:
-            st.success("🏁 Tous les matchs sont terminés ! Consultez l'onglet 'Classement Général'.")
+            if not n_manual:
+                st.info("Aucun match manuel créé pour l'instant.")
+            else:
+                st.subheader(f"📋 Matchs manuels existants ({n_manual})")
+                mids = match_filters("manual", m_type='manuel')
+
+                for mid in paginate(mids, "manual"):
+                    data = model["matches"][mid]
+                    label = data.get('label', mid)
+                    status = data['status']
+                    teams_str = ' vs '.join(data['teams'])
+                    status_icon = "✅" if status == 'Terminé' else "⏳"
+
+                    with st.expander(f"{status_icon} **{label}** [{mid}] — {teams_str} — {status}"):
+                        col_info, col_scores, col_action = st.columns([2, 2, 1])
+
+                        with col_info:
+                            st.markdown(
+                                f"**Équipes :** {teams_str}  \n**Statut :** {status}  \n**Format :** {len(data['teams'])} équipes"
+                            )
+
+                        with col_scores:
+                            if status == 'Terminé':
+                                st.markdown("**Scores finaux et points match :**\n\n"
+                                            + _scores_md(data['scores'], compute_match_points(data['scores'])))
+                            else:
+                                st.write("*Match non encore joué*")
+
+                        with col_action:
+                            if status != 'Terminé':
+                                if st.button("🗑️ Supprimer", key=f"del_{mid}"):
+                                    if delete_manual_match(mid):
+                                        st.success("Match supprimé.")
+                                        st.rerun()
+                            else:
+                                st.write("*(terminé)*")
+
+    # --- PAGE 4 : ARBITRAGE ---
+    elif page == "Console d'Arbitrage":
+        if not model["matches"]:
+            st.error("Générez le calendrier ou créez des matchs manuels d'abord.")
+        elif model["setup"]["questions_df"].empty:
+            st.error("Importez les questions d'abord.")
         else:
-            m_id = st.selectbox(
-                "Sélectionner la rencontre à arbitrer",
-                available_matches,
-                format_func=lambda x: get_match_display_name(x, st.session_state.matches[x])
-            )
+            available_matches = [mid for mid, data in model["matches"].items() if data['status'] != 'Terminé']
 
-            m_data = st.session_state.matches[m_id]
-            is_manual = m_data.get('type') == 'manuel'
-            label = m_data.get('label', f"Match {m_id}")
-            header_class = "match-header-manual" if is_manual else "match-header"
-            badge_text = " 🟣 MANUEL" if is_manual else ""
+            if not available_matches:
+                st.success("🏁 Tous les matchs sont terminés ! Consultez l'onglet 'Classement Général'.")
+            else:
+                m_id = st.selectbox(
+                    "Sélectionner la rencontre à arbitrer",
+                    available_matches,
+                    format_func=lambda x: get_match_display_name(x, model["matches"][x])
+                )
 
-            st.markdown(
-                f"<div class='{header_class}'><h1>{label} [{m_id}]{badge_text} : {' vs '.join(m_data['teams'])}</h1></div>",
-                unsafe_allow_html=True
-            )
+                m_data = model["matches"][m_id]
+                is_manual = m_data.get('type') == 'manuel'
+                label = m_data.get('label', f"Match {m_id}")
+                header_class = "match-header-manual" if is_manual else "match-header"
+                badge_text = " 🟣 MANUEL" if is_manual else ""
 
-            q_list = st.session_state.questions_df.to_dict(orient='records')
-            curr_idx = st.session_state.match_progress[m_id]["q_idx"]
-
-            if curr_idx < len(q_list):
-                q = q_list[curr_idx]
-                st.subheader(f"📍 {q['Manche']} — {q['Rubrique']}")
-                if 'Consigne' in q and pd.notna(q['Consigne']):
-                    st.markdown(f"<div class='instruction-box'>{q['Consigne']}</div>", unsafe_allow_html=True)
-
-                st.markdown(f"<div class='question-box'><b>Question n°{curr_idx + 1} :</b><br>{q['Question']}</div>", unsafe_allow_html=True)
-                pts_val = q['Points']
-                temps_val = q['Temps']
-                st.write(f"Points : **{pts_val}** | Temps : **{temps_val}s**")
-
-                c_score, c_nav = st.columns([2, 1])
-                with c_score:
-                    cols = st.columns(len(m_data['teams']))
-                    for i, team in enumerate(m_data['teams']):
-                        with cols[i]:
-                            st.markdown(f"**{team}**")
-                            players = st.session_state.teams_df[st.session_state.teams_df['Equipe'] == team]['Joueur'].tolist()
-                            for p in players:
-                                if st.button(f"🎯 {p}", key=f"p_{m_id}_{p}_{curr_idx}"):
-                                    m_data['scores'][team] += int(pts_val)
-                                    st.session_state.player_scores[p] += int(pts_val)
-                                    st.toast(f"+{pts_val} pour {p}")
-
-                with c_nav:
-                    st.write("⏱️ **Chrono**")
-                    if st.button("Lancer"):
-                        p_t = st.empty()
-                        for s in range(int(temps_val), -1, -1):
-                            p_t.metric("Chrono", f"{s}s")
-                            time.sleep(1)
-                        st.error("FIN !")
-                    st.divider()
-                    if st.button("Suivant ➡️", type="primary"):
-                        st.session_state.match_progress[m_id]["q_idx"] += 1
+                st.markdown(
+                    f"<div class='{header_class}'><h1>{label} [{m_id}]{badge_text} : {' vs '.join(m_data['teams'])}</h1></div>",
+                    unsafe_allow_html=True
+                )
+
+                scoring_panel(m_id)
+
+                if st.button("🏁 TERMINER LE MATCH", type="primary"):
+                    close_match(m_id)
+                    save_data, kind = export_delta_save()
+                    timestamp = datetime.now().strftime('%d%m_%H%M')
+                    filename = f"tournoi_{'delta' if kind == 'delta' else 'save'}_{timestamp}.tournoi"
+                    st.success("✅ Match clôturé ! Téléchargez la sauvegarde ci-dessous, puis continuez.")
+                    st.download_button(
+                        label="📥 Télécharger la sauvegarde " + ("différentielle" if kind == "delta" else "complète"),
+                        data=save_data,
+                        file_name=filename,
+                        mime="application/gzip",
+                        type="primary"
+                    )
+                    st.info("Après le téléchargement, cliquez sur **Actualiser** pour continuer.")
+                    if st.button("🔄 Actualiser", key=f"refresh_{m_id}"):
                         st.rerun()
-            else:
-                st.success("Questions terminées pour ce match.")
 
-            st.divider()
-            sc_cols = st.columns(len(m_data['teams']))
-            for i, t in enumerate(m_data['teams']):
-                sc_cols[i].metric(t, f"{m_data['scores'][t]} pts")
-
-            if st.button("🏁 TERMINER LE MATCH", type="primary"):
-                st.session_state.matches[m_id]['status'] = 'Terminé'
-                save_data = export_state_json()
-                timestamp = datetime.now().strftime('%d%m_%H%M')
-                filename = f"tournoi_save_{timestamp}.json"
-                st.success("✅ Match clôturé ! Téléchargez la sauvegarde ci-dessous, puis continuez.")
-                st.download_button(
-                    label="📥 Télécharger la sauvegarde JSON",
-                    data=save_data,
-                    file_name=filename,
-                    mime="application/json",
-                    type="primary"
+    # --- PAGE 5 : CLASSEMENT ---
+    elif page == "Classement Général":
+        st.title("📊 Classement Général")
+
+        if not model["setup"]["teams_df"].empty:
+            if st.button("🔍 Vérifier la cohérence du classement"):
+                issues = check_standings()
+                if issues:
+                    st.error("Écarts détectés, classement reconstruit :\n\n" + "\n\n".join(issues))
+                    model = read_model()
+                else:
+                    st.success("Classement cohérent avec un recalcul complet.")
+
+            roster = model["setup"]["roster"]
+
+            t_rank, p_rank, proj_tab, detail_tab, export_tab = st.tabs(
+                ["🏆 Équipes", "🥇 Joueurs", "🔮 Projections", "📋 Détail des Matchs", "📤 Exports"]
+            )
+
+            df_r, df_p = standings_tables(model["standings"], roster)
+
+            with t_rank, profile_section("onglet : équipes"):
+                tiebreakers = st.multiselect(
+                    "Critères de départage (dans l'ordre, après les Points Match)",
+                    TIEBREAKERS, default=["Total Quiz"], key="tiebreakers",
                 )
-                st.info("Après le téléchargement, cliquez sur **Actualiser** pour continuer.")
-                if st.button("🔄 Actualiser", key=f"refresh_{m_id}"):
-                    st.rerun()
-
-# --- PAGE 5 : CLASSEMENT ---
-elif page == "Classement Général":
-    st.title("📊 Classement Général")
-
-    if not st.session_state.teams_df.empty:
-        rank_data = {}
-        for t in st.session_state.teams_df['Equipe'].unique():
-            rank_data[t] = {'Points Match': 0, 'Total Quiz': 0, 'Matchs Joués': 0}
-
-        for mid, data in st.session_state.matches.items():
-            for t, s in data['scores'].items():
-                if t in rank_data:
-                    rank_data[t]['Total Quiz'] += s
-
-            if data['status'] == 'Terminé':
-                match_pts = compute_match_points(data['scores'])
-                for t, pts in match_pts.items():
-                    if t in rank_data:
-                        rank_data[t]['Points Match'] += pts
-                        rank_data[t]['Matchs Joués'] += 1
-
-        t_rank, p_rank, detail_tab = st.tabs(["🏆 Équipes", "🥇 Joueurs", "📋 Détail des Matchs"])
-
-        with t_rank:
-            df_r = pd.DataFrame.from_dict(rank_data, orient='index').reset_index()
-            df_r.columns = ['Équipe', 'Points Match', 'Total Quiz', 'Matchs Joués']
-            df_r = df_r.sort_values(by=['Points Match', 'Total Quiz'], ascending=False).reset_index(drop=True)
-            df_r.index += 1
-            st.table(df_r)
-
-        with p_rank:
-            def get_team(player):
-                match = st.session_state.teams_df[st.session_state.teams_df['Joueur'] == player]
-                return match['Equipe'].values[0] if len(match) > 0 else "—"
-
-            p_list = [
-                {"Joueur": p, "Equipe": get_team(p), "Score": s}
-                for p, s in st.session_state.player_scores.items()
-            ]
-            st.dataframe(pd.DataFrame(p_list).sort_values(by="Score", ascending=False), use_container_width=True, hide_index=True)
-
-        with detail_tab:
-            st.subheader("Récapitulatif de tous les matchs")
-            for mid, data in st.session_state.matches.items():
-                match_type = "🟣 Manuel" if data.get('type') == 'manuel' else "🔵 Calendrier"
-                label = data.get('label', f"Match {mid}")
-                status_icon = "✅" if data['status'] == 'Terminé' else "⏳"
-                with st.expander(f"{status_icon} **{label}** [{mid}] — {match_type} — {data['status']}"):
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.write("**Scores Quiz :**")
-                        for t, s in data['scores'].items():
-                            st.write(f"• {t} : {s} pts")
-                    with col2:
+                if tiebreakers != ["Total Quiz"]:
+                    # Départage personnalisé : recalcul groupé en une passe
+                    df_r = rank_teams(model["matches"], roster['teams'], tiebreakers)
+                st.table(df_r)
+
+            with p_rank, profile_section("onglet : joueurs"):
+                st.dataframe(df_p, width="stretch", hide_index=True)
+
+            with proj_tab, profile_section("onglet : projections"):
+                teams = roster['teams']
+                remaining = sum(d['status'] != 'Terminé' for d in model["matches"].values())
+                if model["setup"]["questions_df"].empty:
+                    st.info("Importez la banque de questions pour simuler les matchs restants.")
+                elif not remaining:
+                    st.info("Tous les matchs sont terminés : le classement est définitif.")
+                else:
+                    c_sims, c_qual = st.columns(2)
+                    n_sims = c_sims.select_slider("Nombre de simulations", [5000, 10000, 20000, 50000], value=20000)
+                    n_qualified = c_qual.number_input("Places qualificatives", min_value=1, max_value=len(teams),
+                                                      value=min(4, len(teams)))
+                    if st.toggle(f"Simuler les {remaining} match(s) restant(s)", key="projection_on"):
+                        probs = project_rankings(
+                            model["version"], n_sims, tuple(teams), model["matches"],
+                            model["match_progress"], model["setup"]["bank"],
+                        )
+                        st.caption("Probabilités (%) de finir à chaque rang, d'après les taux de réussite observés "
+                                   "et les points des questions restantes de chaque match.")
+                        st.dataframe(projection_table(probs, teams, n_qualified).style.format(precision=1),
+                                     width="stretch")
+
+            with detail_tab, profile_section("onglet : détail des matchs"):
+                st.subheader("Récapitulatif de tous les matchs")
+                mids = match_filters("detail")
+                for mid in paginate(mids, "detail"):
+                    data = model["matches"][mid]
+                    match_type = "🟣 Manuel" if data.get('type') == 'manuel' else "🔵 Calendrier"
+                    label = data.get('label', f"Match {mid}")
+                    status_icon = "✅" if data['status'] == 'Terminé' else "⏳"
+                    with st.expander(f"{status_icon} **{label}** [{mid}] — {match_type} — {data['status']}"):
                         if data['status'] == 'Terminé':
-                            mp = compute_match_points(data['scores'])
-                            st.write("**Points Match :**")
-                            for t, p in mp.items():
-                                st.write(f"• {t} : {p} pts")
+                            st.markdown("**Scores Quiz → Points Match :**\n\n"
+                                        + _scores_md(data['scores'], compute_match_points(data['scores'])))
                         else:
-                            st.write("*Match non terminé*")
-    else:
-        st.warning("Veuillez d'abord importer les équipes.")
+                            st.markdown("**Scores Quiz :** *(match non terminé)*\n\n" + _scores_md(data['scores']))
+
+            with export_tab, profile_section("onglet : exports"):
+                export_panel()
+        else:
+            st.warning("Veuillez d'abord importer les équipes.")
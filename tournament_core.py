@@ -0,0 +1,1005 @@
+"""
+Logique du tournoi indépendante de Streamlit.
+
+Tout ce qui ne dépend pas de la session (points de match, calendrier,
+classement, index des équipes, banque de questions, validation des
+imports, format de sauvegarde) vit ici : `code.py` n'en est que l'interface, et ces fonctions
+peuvent être importées, testées ou chronométrées sans runtime Streamlit.
+"""
+import copy
+import gzip
+import hashlib
+import io
+import json
+from bisect import bisect_left, insort
+from itertools import combinations
+
+import numpy as np
+
+# pandas (et openpyxl, via read_excel) n'est importé que par les fonctions qui
+# produisent ou lisent des tableaux : le démarrage de l'application n'en dépend pas.
+
+TEAM_COLUMNS = ['Equipe', 'Joueur']
+QUESTION_COLUMNS = ['Manche', 'Rubrique', 'Question', 'Points', 'Temps']
+
+# --- IMPORT DES FICHIERS ---
+def read_table(data, name):
+    """Lit un fichier CSV (séparateur détecté) ou XLSX à partir de ses octets."""
+    import pandas as pd
+    buf = io.BytesIO(data)
+    if name.endswith('.csv'):
+        return pd.read_csv(buf, sep=None, engine='python')
+    return pd.read_excel(buf)
+
+def _row_list(mask, limit=10):
+    """Numéros de ligne (tels qu'affichés dans le tableur) des lignes en erreur."""
+    rows = (mask[mask].index + 2).tolist()
+    return ', '.join(map(str, rows[:limit])) + (' …' if len(rows) > limit else '')
+
+def validate_teams(df):
+    """Valide et normalise un fichier équipes. Retourne (df, erreurs, avertissements)."""
+    if not all(col in df.columns for col in TEAM_COLUMNS):
+        return None, [f"Colonnes manquantes. Requis : {', '.join(TEAM_COLUMNS)}"], []
+    df = df.dropna(subset=TEAM_COLUMNS).copy()
+    for col in TEAM_COLUMNS:
+        df[col] = df[col].astype(str).str.strip()
+
+    warnings = []
+    dup = df.duplicated(subset=TEAM_COLUMNS)
+    if dup.any():
+        warnings.append(f"Joueurs en double ignorés (lignes {_row_list(dup)}).")
+        df = df[~dup]
+    return df.reset_index(drop=True), [], warnings
+
+def validate_questions(df):
+    """Valide une banque de questions (Points/Temps entiers). Retourne (df, erreurs, avertissements)."""
+    import pandas as pd
+    if not all(col in df.columns for col in QUESTION_COLUMNS):
+        return None, [f"Colonnes manquantes. Requis : {', '.join(QUESTION_COLUMNS)}"], []
+
+    df = df.copy()
+    errors = []
+    limits = np.iinfo(np.int32)  # type des colonnes Points / Temps de la banque (build_question_bank)
+    for col in ['Points', 'Temps']:
+        values = pd.to_numeric(df[col], errors='coerce')
+        bad = values.isna()
+        if bad.any():
+            errors.append(f"Colonne {col} non numérique (lignes {_row_list(bad)}).")
+            continue
+        out = ~values.between(limits.min, limits.max)  # infinis compris
+        if out.any():
+            errors.append(f"Colonne {col} : valeurs hors de [{limits.min}, {limits.max}] (lignes {_row_list(out)}).")
+            continue
+        fractional = values != values.round()
+        if fractional.any():
+            errors.append(f"Colonne {col} : valeurs non entières (lignes {_row_list(fractional)}).")
+        else:
+            df[col] = values.astype(int)
+    if errors:
+        return None, errors, []
+    if 'Consigne' not in df.columns:
+        df['Consigne'] = None
+    return df, [], []
+
+# --- INDEX DES ÉQUIPES ---
+def build_roster(teams_df):
+    """
+    Construit l'index joueur ↔ équipe une seule fois par import.
+    Un nom porté dans plusieurs équipes reçoit l'identifiant « Nom (Equipe) »
+    pour que les scores des homonymes ne fusionnent pas.
+    """
+    df = teams_df.dropna(subset=TEAM_COLUMNS).drop_duplicates(subset=TEAM_COLUMNS)
+    shared = df.groupby('Joueur')['Equipe'].transform('nunique') > 1
+
+    team_players, player_team, player_name = {}, {}, {}
+    for team, name, is_shared in zip(df['Equipe'], df['Joueur'], shared):
+        pid = f"{name} ({team})" if is_shared else name
+        team_players.setdefault(team, []).append(pid)
+        player_team[pid] = team
+        player_name[pid] = name
+    return {
+        'teams': sorted(team_players),
+        'team_players': team_players,
+        'player_team': player_team,
+        'player_name': player_name,
+    }
+
+def roster_renames(old, new):
+    """
+    Identifiants changés par un nouvel import : {ancien: nouveau} pour chaque
+    joueur (même équipe, même nom) présent dans les deux index. Un nom qui
+    devient homonyme passe de « Nom » à « Nom (Equipe) », et inversement.
+    """
+    new_ids = {(team, new['player_name'][pid]): pid for pid, team in new['player_team'].items()}
+    renames = {}
+    for pid, team in old['player_team'].items():
+        target = new_ids.get((team, old['player_name'][pid]))
+        if target is not None and target != pid:
+            renames[pid] = target
+    return renames
+
+# --- BANQUE DE QUESTIONS ---
+def _group_positions(codes, n_groups):
+    """Positions des questions de chaque code (ordre de la banque conservé), en un seul tri."""
+    order = np.argsort(codes, kind='stable')
+    return np.split(order, np.cumsum(np.bincount(codes, minlength=n_groups))[:-1])
+
+def build_question_bank(questions_df):
+    """
+    Banque rangée par colonnes, construite une fois par import (banque validée) :
+    Manche et Rubrique en catégories (codes entiers), Points et Temps en entiers,
+    index des positions par manche et par rubrique. Lire une question ne
+    touche plus au DataFrame.
+    """
+    import pandas as pd
+    bank = {'size': len(questions_df), 'pools': {}}
+    for col, key in (('Manche', 'round'), ('Rubrique', 'category')):
+        values = questions_df[col].astype(str)
+        cat = pd.Categorical(values, categories=pd.unique(values))
+        labels, codes = list(cat.categories), cat.codes.astype(np.int32)
+        bank[f'{key}_labels'] = labels
+        bank[f'{key}_codes'] = codes
+        bank[f'by_{key}'] = dict(zip(labels, _group_positions(codes, len(labels))))
+    bank['question'] = questions_df['Question'].astype(str).to_numpy(dtype=object)
+    if 'Consigne' in questions_df.columns:
+        consigne = questions_df['Consigne'].astype(object)
+        bank['consigne'] = consigne.where(consigne.notna(), None).to_numpy(dtype=object)
+    else:
+        bank['consigne'] = np.full(len(questions_df), None, dtype=object)
+    bank['points'] = questions_df['Points'].to_numpy(dtype=np.int32)
+    bank['temps'] = questions_df['Temps'].to_numpy(dtype=np.int32)
+    return bank
+
+def bank_question(bank, i):
+    """Question à la position `i` de la banque, au format d'une ligne du fichier importé."""
+    return {
+        'Manche': bank['round_labels'][bank['round_codes'][i]],
+        'Rubrique': bank['category_labels'][bank['category_codes'][i]],
+        'Question': bank['question'][i],
+        'Points': int(bank['points'][i]),
+        'Temps': int(bank['temps'][i]),
+        'Consigne': bank['consigne'][i],
+    }
+
+# --- PAQUETS DE QUESTIONS PAR MATCH ---
+# Un paquet est décrit par {'rounds', 'seed', 'start', 'size'} : les questions
+# des manches `rounds` (None = toutes) mélangées par `seed`, lues à partir de
+# `start`. Seule cette description est enregistrée avec le match.
+DEFAULT_DECK_SIZE = 20
+
+def deck_pool(bank, rounds, seed):
+    """
+    Positions des questions des manches `rounds`, mélangées : calculé une fois par banque.
+    La banque peut être partagée entre fils : setdefault garde le premier calcul (identique).
+    """
+    key = (None if rounds is None else tuple(rounds), seed)
+    pool = bank['pools'].get(key)
+    if pool is None:
+        if rounds is None:
+            positions = np.arange(bank['size'])
+        else:
+            positions = np.sort(np.concatenate(
+                [bank['by_round'][r] for r in rounds if r in bank['by_round']] or [np.zeros(0, dtype=np.int64)]
+            ))
+        pool = bank['pools'].setdefault(key, np.random.default_rng(seed).permutation(positions))
+    return pool
+
+def deck_length(bank, deck):
+    """Nombre de questions d'un match (sans paquet : toute la banque, dans l'ordre)."""
+    if deck is None:
+        return bank['size']
+    return deck['size'] if len(deck_pool(bank, deck['rounds'], deck['seed'])) else 0
+
+def deck_position(bank, deck, q_idx):
+    """Position dans la banque de la question n°`q_idx` du match, en O(1) ; None après la dernière."""
+    if q_idx >= deck_length(bank, deck):
+        return None
+    if deck is None:
+        return q_idx
+    pool = deck_pool(bank, deck['rounds'], deck['seed'])
+    return int(pool[(deck['start'] + q_idx) % len(pool)])
+
+def deck_positions(bank, deck):
+    """Positions de toutes les questions du match, dans l'ordre où elles sont posées."""
+    if deck is None:
+        return np.arange(bank['size'])
+    pool = deck_pool(bank, deck['rounds'], deck['seed'])
+    if not len(pool):
+        return np.zeros(0, dtype=np.int64)
+    return pool[(deck['start'] + np.arange(deck['size'])) % len(pool)]
+
+def allocate_decks(matches, count, size, rounds=None, seed=None):
+    """
+    `count` paquets de `size` questions, à la suite de ceux des matchs qui tirent
+    déjà dans les mêmes manches (même permutation) : aucune question n'est
+    reposée d'un match à l'autre tant que ces manches n'ont pas été épuisées.
+    """
+    rounds = None if rounds is None else sorted(str(r) for r in rounds)
+    same = [m['deck'] for m in matches.values() if m.get('deck') and m['deck']['rounds'] == rounds]
+    if same:
+        seed, start = same[0]['seed'], max(d['start'] + d['size'] for d in same)
+    else:
+        seed = int(np.random.default_rng(seed).integers(2**31))
+        start = 0
+    return [{'rounds': rounds, 'seed': seed, 'start': start + k * size, 'size': size} for k in range(count)]
+
+# --- CALCUL DES POINTS DE MATCH AVEC GESTION DES ÉGALITÉS ---
+def compute_match_points(scores):
+    """
+    Règles :
+      - 1 seul vainqueur          → 3 pts, 2ème → 1 pt, 3ème → 0 pt
+      - Égalité 1ère place (2 éq) → 1 pt chacune, 3ème → 0 pt
+      - Égalité 1ère place (3 éq) → 1 pt chacune
+      - 2ème et 3ème à égalité    → 1 pt chacune, 1er → 3 pts
+    Retourne un dict {equipe: points_match}
+    """
+    result = {t: 0 for t in scores}
+    sorted_scores = sorted(set(scores.values()), reverse=True)
+
+    rank1_score = sorted_scores[0]
+    rank1_teams = [t for t, s in scores.items() if s == rank1_score]
+
+    if len(rank1_teams) >= 2:
+        for t in rank1_teams:
+            result[t] = 1
+        return result
+
+    winner = rank1_teams[0]
+    result[winner] = 3
+
+    if len(sorted_scores) >= 2:
+        rank2_score = sorted_scores[1]
+        rank2_teams = [t for t, s in scores.items() if s == rank2_score]
+        for t in rank2_teams:
+            result[t] = 1
+
+    return result
+
+# --- CALCUL GROUPÉ (NUMPY) ---
+TIEBREAKERS = ["Total Quiz", "Confrontations directes", "Matchs Joués"]
+
+def _points_from_scores(S):
+    """
+    Mêmes règles que compute_match_points, pour tous les matchs à la fois.
+    S : matrice matchs × places, -inf pour une place vide (match à 2 équipes).
+    """
+    top = S.max(axis=1, keepdims=True)
+    is_top = S == top
+    shared_top = is_top.sum(axis=1, keepdims=True) >= 2
+    second = np.where(is_top, -np.inf, S).max(axis=1, keepdims=True)
+    is_second = (S == second) & np.isfinite(S)
+    return np.where(shared_top, is_top * 1, is_top * 3 + is_second * 1).astype(np.int8)
+
+def bulk_match_points(matches, teams):
+    """
+    Points de match de tous les matchs terminés en une passe.
+    Retourne (mids, T, S, P) : matrices matchs × places des indices d'équipe
+    dans `teams` (-1 = place vide ou équipe inconnue), des scores et des points.
+    """
+    team_pos = {t: i for i, t in enumerate(teams)}
+    mids = [mid for mid, d in matches.items() if d['status'] == 'Terminé']
+    width = max((len(matches[mid]['scores']) for mid in mids), default=2)
+    S = np.full((len(mids), width), -np.inf)
+    T = np.full((len(mids), width), -1, dtype=np.int64)
+    for k, mid in enumerate(mids):
+        for j, (t, s) in enumerate(matches[mid]['scores'].items()):
+            S[k, j] = s
+            T[k, j] = team_pos.get(t, -1)
+    return mids, T, S, _points_from_scores(S)
+
+def match_points_matrix(matches, teams):
+    """Matrice équipes × matchs terminés des points de match (0 si l'équipe n'a pas joué)."""
+    import pandas as pd
+    mids, T, _, P = bulk_match_points(matches, teams)
+    M = np.zeros((len(teams), len(mids)), dtype=np.int8)
+    rows, cols = np.nonzero(T >= 0)
+    M[T[rows, cols], rows] = P[rows, cols]
+    return pd.DataFrame(M, index=list(teams), columns=mids)
+
+def team_totals(matches, teams, bulk=None):
+    """Points Match, Total Quiz (tous matchs) et Matchs Joués, alignés sur `teams`."""
+    n = len(teams)
+    _, T, _, P = bulk if bulk is not None else bulk_match_points(matches, teams)
+    valid = T >= 0
+    points = np.bincount(T[valid], weights=P[valid], minlength=n).astype(np.int64)
+    played = np.bincount(T[valid], minlength=n)
+    team_pos = {t: i for i, t in enumerate(teams)}
+    pairs = [(team_pos[t], s) for d in matches.values() for t, s in d['scores'].items() if t in team_pos]
+    idx, vals = (np.array(x) for x in zip(*pairs)) if pairs else (np.zeros(0, int), np.zeros(0))
+    quiz = np.bincount(idx, weights=vals, minlength=n).astype(np.int64)
+    return points, quiz, played
+
+def _head_to_head(T, S, keys):
+    """
+    Bilan des confrontations directes (victoires − défaites au score de quiz)
+    entre équipes encore à égalité sur tous les critères de `keys`.
+    """
+    n = len(keys[0])
+    group = np.unique(np.stack(keys, axis=1), axis=0, return_inverse=True)[1].ravel()
+    h2h = np.zeros(n)
+    for i, j in combinations(range(T.shape[1]), 2):
+        ti, tj = T[:, i], T[:, j]
+        ok = (ti >= 0) & (tj >= 0)
+        ok[ok] = group[ti[ok]] == group[tj[ok]]
+        sign = np.sign(S[ok, i] - S[ok, j])
+        np.add.at(h2h, ti[ok], sign)
+        np.add.at(h2h, tj[ok], -sign)
+    return h2h.astype(np.int64)
+
+def rank_teams(matches, teams, tiebreakers=("Total Quiz",)):
+    """
+    Classement des équipes : Points Match, puis les critères de départage
+    dans l'ordre donné (voir TIEBREAKERS ; « Matchs Joués » favorise l'équipe
+    ayant joué le moins), puis le nom. Tout est calculé dans la même passe.
+    """
+    import pandas as pd
+    teams = list(teams)
+    bulk = bulk_match_points(matches, teams)
+    points, quiz, played = team_totals(matches, teams, bulk)
+    columns = {'Points Match': points}
+    keys = [points]
+    for tb in tiebreakers:
+        if tb == "Total Quiz":
+            columns[tb], key = quiz, quiz
+        elif tb == "Matchs Joués":
+            columns[tb], key = played, -played
+        elif tb == "Confrontations directes":
+            columns[tb] = key = _head_to_head(bulk[1], bulk[2], keys)
+        else:
+            raise ValueError(f"Critère de départage inconnu : {tb}")
+        keys.append(key)
+    columns.setdefault('Total Quiz', quiz)
+    columns.setdefault('Matchs Joués', played)
+
+    names = np.argsort(np.argsort(np.array(teams, dtype=object)))
+    order = np.lexsort([names] + [-k for k in reversed(keys)])
+    df = pd.DataFrame({'Équipe': np.array(teams, dtype=object)[order], **{c: v[order] for c, v in columns.items()}})
+    df.index += 1
+    return df
+
+# --- PROJECTIONS (MONTE CARLO) ---
+def _match_length(matches, match_progress, n_bank, decks=()):
+    """
+    Nombre de questions d'un match sans paquet : médiane des matchs sans paquet
+    terminés, sinon DEFAULT_DECK_SIZE (jamais toute la banque, qui peut compter
+    des milliers de questions).
+    """
+    asked = [
+        min(match_progress.get(mid, {}).get('q_idx', 0) + 1, n_bank)
+        for mid, d in matches.items() if d['status'] == 'Terminé' and mid not in decks
+    ]
+    return int(np.median(asked)) if asked else min(DEFAULT_DECK_SIZE, n_bank)
+
+QUANTILE_BINS = 8192
+SIM_BLOCK = 1_000_000
+
+def _score_quantiles(left, values, p):
+    """
+    Loi exacte du score restant de chaque (match, place) — somme de binomiales
+    par valeur de question — tabulée en QUANTILE_BINS quantiles pour un tirage
+    par simple indexation.
+    """
+    dist = np.zeros((len(left), int((left @ values).max(initial=0)) + 1))
+    dist[:, 0] = 1.0
+    for v, counts in zip(values, left.T):
+        for c in range(int(counts.max(initial=0))):
+            step = dist * (1 - p[:, None])
+            if v > 0:
+                step[:, v:] += dist[:, :-v] * p[:, None]
+            else:
+                step += dist * p[:, None]
+            dist = np.where((counts > c)[:, None], step, dist)
+    cdf = np.cumsum(dist, axis=1)
+    grid = (np.arange(QUANTILE_BINS) + 0.5) / QUANTILE_BINS
+    return np.stack([np.searchsorted(row, grid * row[-1]) for row in cdf])
+
+def simulate_rankings(matches, match_progress, teams, question_points, n_sims=20000, seed=None, prior=20.0, decks=None):
+    """
+    Projection Monte Carlo du classement final (Points Match, puis Total Quiz, puis nom).
+
+    Chaque équipe réussit une question avec un taux tiré de l'historique
+    (points marqués / points mis en jeu dans ses matchs, lissé vers la moyenne
+    générale sur `prior` points). Les matchs non terminés sont rejoués à partir
+    de leur question courante, avec les points réels des questions restantes
+    (celles de leur paquet, `decks` : {match: positions dans la banque}, sinon
+    celles de la banque dans l'ordre), puis notés avec les règles de
+    compute_match_points.
+    Retourne la matrice équipes × rangs des probabilités (ligne i : teams[i]).
+    """
+    teams = list(teams)
+    n = len(teams)
+    team_pos = {t: i for i, t in enumerate(teams)}
+    rng = np.random.default_rng(seed)
+
+    points_bank = np.asarray(question_points, dtype=np.int64)
+    decks = decks or {}
+    length = _match_length(matches, match_progress, len(points_bank), decks)
+    bank = points_bank[:length]
+    cum_points = np.concatenate([[0], np.cumsum(bank)])
+    values = np.unique(points_bank)
+    # cum_counts[v, k] : questions de valeur values[v] parmi les k premières
+    cum_counts = np.concatenate(
+        [np.zeros((len(values), 1), dtype=np.int64), np.cumsum(bank[None, :] == values[:, None], axis=1)], axis=1
+    )
+
+    # Historique : points marqués et points mis en jeu par équipe
+    scored, available = np.zeros(n), np.zeros(n)
+    remaining = []
+    for mid, d in matches.items():
+        q_idx = match_progress.get(mid, {}).get('q_idx', 0)
+        done = d['status'] == 'Terminé'
+        deck = points_bank[decks[mid]] if mid in decks else None
+        n_q = length if deck is None else len(deck)
+        asked = min(q_idx + 1 if done else q_idx, n_q)
+        at_stake = cum_points[asked] if deck is None else deck[:asked].sum()
+        for t, sc in d['scores'].items():
+            if t in team_pos:
+                scored[team_pos[t]] += sc
+                available[team_pos[t]] += at_stake
+        if not done:
+            start = min(q_idx, n_q)
+            if deck is None:
+                left_counts = cum_counts[:, length] - cum_counts[:, start]
+            else:
+                left_counts = np.bincount(np.searchsorted(values, deck[start:]), minlength=len(values))
+            remaining.append((d, left_counts))
+    base_rate = scored.sum() / available.sum() if available.sum() else 0.5
+    rate = np.clip((scored + prior * base_rate) / (available + prior), 0.0, 1.0)
+
+    points, quiz, _ = team_totals(matches, teams)
+    final_points = np.tile(points.astype(np.float64), (n_sims, 1))
+    final_quiz = np.tile(quiz.astype(np.float64), (n_sims, 1))
+
+    if remaining:
+        width = max(len(d['scores']) for d, _ in remaining)
+        M = len(remaining)
+        T = np.full((M, width), -1, dtype=np.int64)
+        current = np.full((M, width), -np.inf)
+        p = np.zeros((M, width))
+        left = np.zeros((M, width, len(values)), dtype=np.int64)
+        for k, (d, left_counts) in enumerate(remaining):
+            for j, (t, sc) in enumerate(d['scores'].items()):
+                T[k, j] = team_pos.get(t, -1)
+                current[k, j] = sc
+                p[k, j] = rate[T[k, j]] if T[k, j] >= 0 else base_rate
+                left[k, j] = left_counts
+
+        slots = np.isfinite(current)
+        valid = T >= 0
+        quantiles = _score_quantiles(left[slots], values, p[slots]).T
+        # Par blocs de simulations pour borner la mémoire (~SIM_BLOCK valeurs par tableau)
+        block = max(1, SIM_BLOCK // (M * width))
+        for lo in range(0, n_sims, block):
+            size = min(block, n_sims - lo)
+            gained = np.zeros((size, M, width))
+            gained[:, slots] = np.take_along_axis(
+                quantiles, rng.integers(0, QUANTILE_BINS, size=(size, quantiles.shape[1])), axis=0
+            )
+            P = _points_from_scores((current[None] + gained).reshape(-1, width)).reshape(size, M, width)
+            flat = (np.arange(size)[:, None] * n + T[valid][None, :]).ravel()
+            final_points[lo:lo + size] += np.bincount(flat, weights=P[:, valid].ravel(), minlength=size * n).reshape(size, n)
+            final_quiz[lo:lo + size] += np.bincount(flat, weights=gained[:, valid].ravel(), minlength=size * n).reshape(size, n)
+
+    # Tri stable sur une clé unique, colonnes rangées par nom pour le départage final
+    by_name = np.argsort(np.array(teams, dtype=object), kind='stable')
+    key = final_points[:, by_name] * (final_quiz.max() + 1) + final_quiz[:, by_name]
+    order = by_name[np.argsort(-key, axis=1, kind='stable')]
+    counts = np.bincount((order * n + np.arange(n)).ravel(), minlength=n * n).reshape(n, n)
+    return counts / n_sims
+
+def projection_table(probs, teams, n_qualified=None):
+    """Tableau des probabilités de rang (en %), trié par rang moyen projeté."""
+    import pandas as pd
+    n = len(teams)
+    ranks = np.arange(1, n + 1)
+    columns = {'Équipe': list(teams), 'Rang moyen': probs @ ranks}
+    if n_qualified:
+        columns[f'Top {n_qualified} (%)'] = probs[:, :n_qualified].sum(axis=1) * 100
+    columns.update({f'{r}e' if r > 1 else '1er': probs[:, r - 1] * 100 for r in ranks})
+    df = pd.DataFrame(columns)
+    df = df.sort_values(['Rang moyen', 'Équipe']).reset_index(drop=True)
+    df.index += 1
+    return df
+
+# --- CLASSEMENT INCRÉMENTAL ---
+def _team_key(team, row):
+    """Clé de tri d'une équipe : Points Match puis Total Quiz décroissants."""
+    return (-row['Points Match'], -row['Total Quiz'], team)
+
+def _reposition(order, old_key, new_key):
+    """Déplace une entrée dans une liste triée sans la retrier entièrement."""
+    i = bisect_left(order, old_key)
+    if i < len(order) and order[i] == old_key:
+        del order[i]
+    insort(order, new_key)
+
+def compute_standings(team_names, matches, player_scores):
+    """
+    Calcule le classement complet à partir de zéro (référence pour la vérification),
+    avec le calcul groupé : indépendant des mises à jour incrémentales.
+    """
+    team_names = list(team_names)
+    points, quiz, played = team_totals(matches, team_names)
+    teams = {
+        t: {'Points Match': int(points[i]), 'Total Quiz': int(quiz[i]), 'Matchs Joués': int(played[i])}
+        for i, t in enumerate(team_names)
+    }
+    return {
+        'teams': teams,
+        'team_order': sorted(_team_key(t, row) for t, row in teams.items()),
+        'player_order': sorted((-s, p) for p, s in player_scores.items()),
+    }
+
+def copy_standings(standings):
+    """Copie modifiable d'un classement (lignes d'équipes et ordres), l'original restant intact."""
+    return {
+        'teams': {t: dict(row) for t, row in standings['teams'].items()},
+        'team_order': list(standings['team_order']),
+        'player_order': list(standings['player_order']),
+    }
+
+def standings_diff(current, fresh):
+    """Liste des écarts entre deux classements (vide si identiques)."""
+    issues = []
+    for t in set(current['teams']) | set(fresh['teams']):
+        if current['teams'].get(t) != fresh['teams'].get(t):
+            issues.append(f"Équipe {t} : {current['teams'].get(t)} ≠ {fresh['teams'].get(t)}")
+    if current['team_order'] != fresh['team_order']:
+        issues.append("Ordre des équipes incohérent.")
+    if current['player_order'] != fresh['player_order']:
+        issues.append("Classement des joueurs incohérent.")
+    return issues
+
+def standings_award(standings, team, player, old_score, pts):
+    """Reporte `pts` gagnés par un joueur (score précédent `old_score`) et son équipe."""
+    _reposition(standings['player_order'], (-old_score, player), (-(old_score + pts), player))
+    row = standings['teams'].get(team)
+    if row is not None:
+        old_key = _team_key(team, row)
+        row['Total Quiz'] += pts
+        _reposition(standings['team_order'], old_key, _team_key(team, row))
+
+def standings_close(standings, scores):
+    """Reporte les points de match d'un match qui vient d'être clôturé."""
+    for t, pts in compute_match_points(scores).items():
+        row = standings['teams'].get(t)
+        if row is not None:
+            old_key = _team_key(t, row)
+            row['Points Match'] += pts
+            row['Matchs Joués'] += 1
+            _reposition(standings['team_order'], old_key, _team_key(t, row))
+
+def standings_withdraw(standings, scores):
+    """Retire du Total Quiz les scores d'un match supprimé."""
+    for t, s in scores.items():
+        row = standings['teams'].get(t)
+        if row is not None and s:
+            old_key = _team_key(t, row)
+            row['Total Quiz'] -= s
+            _reposition(standings['team_order'], old_key, _team_key(t, row))
+
+def apply_store_changes(state, standings, changes):
+    """
+    Reporte sur un état (format de sauvegarde) et son classement les changements lus
+    dans le store depuis sa version : points attribués d'abord, dans l'ordre, puis
+    matchs modifiés ou créés (un match clôturé entre-temps compte ses points de match
+    une seule fois, avec ses scores définitifs).
+    """
+    scores = state["player_scores"]
+    for _, _, _, team, player, pts in changes["awards"]:
+        old = scores.get(player, 0)
+        scores[player] = old + pts
+        standings_award(standings, team, player, old, pts)
+    for mid, match in changes["matches"].items():
+        old = state["matches"].get(mid)
+        if match['status'] == 'Terminé' and (old is None or old['status'] != 'Terminé'):
+            standings_close(standings, match['scores'])
+        state["matches"][mid] = match
+    state["match_progress"].update(changes["match_progress"])
+
+def standings_tables(standings, roster):
+    """Tableaux équipes et joueurs, déjà triés, prêts à afficher."""
+    import pandas as pd
+    df_teams = pd.DataFrame(
+        [(t, *standings['teams'][t].values()) for _, _, t in standings['team_order']],
+        columns=['Équipe', 'Points Match', 'Total Quiz', 'Matchs Joués']
+    )
+    df_teams.index += 1
+    df_players = pd.DataFrame(
+        [
+            (roster['player_name'].get(p, p), roster['player_team'].get(p, "—"), -neg_s)
+            for neg_s, p in standings['player_order']
+        ],
+        columns=["Joueur", "Equipe", "Score"]
+    )
+    return df_teams, df_players
+
+# --- CALENDRIER ---
+def group_sizes(n, group_size, duels):
+    """Tailles des matchs d'un tour ; les équipes restantes sont exemptées (sauf `duels`)."""
+    q, r = divmod(n, group_size)
+    if group_size == 3 and duels:
+        if r == 2:
+            return [3] * q + [2]
+        if r == 1 and q >= 1:
+            return [3] * (q - 1) + [2, 2]
+    return [group_size] * q
+
+def build_schedule(n_teams, n_rounds, group_size=3, duels=False, seed=None):
+    """
+    Construit des tours de matchs à 2 ou 3 équipes pour un nombre quelconque d'équipes.
+    Glouton par tour :
+      - les équipes ayant le moins joué sont servies en premier, celles ayant
+        le plus joué sont exemptées quand le nombre d'équipes ne tombe pas juste ;
+      - chaque adversaire est choisi pour minimiser les confrontations déjà vues
+        (matrice de paires), le hasard départageant les égalités.
+    Retourne la liste des tours, chaque tour étant une liste de groupes d'indices.
+    """
+    rng = np.random.default_rng(seed)
+    pairs = np.zeros((n_teams, n_teams), dtype=np.int32)
+    played = np.zeros(n_teams, dtype=np.int32)
+    sizes = group_sizes(n_teams, group_size, duels)
+    n_playing = sum(sizes)
+    # plusieurs essais par tour sur les petits effectifs, où le glouton se trompe le plus
+    attempts = max(1, min(16, 1200 // max(n_teams, 1)))
+
+    rounds = []
+    for _ in range(n_rounds):
+        best, best_cost = None, None
+        for _ in range(attempts):
+            pool = np.lexsort((rng.random(n_teams), played))[:n_playing]
+            groups, repeats = [], 0
+            for size in sizes:
+                group = [pool[0]]
+                pool = pool[1:]
+                for _ in range(size - 1):
+                    # coût quadratique : mieux vaut deux confrontations répétées une fois
+                    # qu'une seule répétée deux fois ; bruit < 1 pour départager les égalités
+                    cost = (pairs[group][:, pool] ** 2).sum(axis=0) + rng.random(len(pool))
+                    k = int(np.argmin(cost))
+                    repeats += int(cost[k])
+                    group.append(pool[k])
+                    pool = np.delete(pool, k)
+                groups.append(group)
+            if best_cost is None or repeats < best_cost:
+                best, best_cost = groups, repeats
+            if repeats == 0:
+                break
+        for group in best:
+            idx = np.array(group)
+            pairs[np.ix_(idx, idx)] += 1
+            played[idx] += 1
+        rounds.append([[int(i) for i in group] for group in best])
+
+    np.fill_diagonal(pairs, 0)
+    return rounds, {
+        "max_repeat": int(pairs.max()) if n_teams else 0,
+        "min_played": int(played.min()) if n_teams else 0,
+        "max_played": int(played.max()) if n_teams else 0,
+    }
+
+def schedule_matches(teams, n_rounds=2, group_size=3, duels=False, seed=None):
+    """
+    Calendrier au format de la session.
+    Retourne (matches, match_progress, stats), ou None s'il y a trop peu d'équipes.
+    """
+    if not group_sizes(len(teams), group_size, duels):
+        return None
+    rounds, stats = build_schedule(len(teams), n_rounds, group_size, duels, seed)
+    matches, progress = {}, {}
+    for r, groups in enumerate(rounds, start=1):
+        for grp in groups:
+            mid = str(len(matches) + 1)
+            m_teams = [teams[j] for j in grp]
+            matches[mid] = {'teams': m_teams, 'scores': {t: 0 for t in m_teams}, 'status': 'Prévu', 'type': 'auto', 'round': r}
+            progress[mid] = {"q_idx": 0}
+    return matches, progress, stats
+
+# --- LISTES DE MATCHS ---
+def filter_matches(matches, finished=None, m_type=None, team=None):
+    """
+    Identifiants des matchs retenus par les filtres (None = pas de filtre) :
+    `finished` (bool), `m_type` ('auto' ou 'manuel'), `team` (équipe participante).
+    """
+    return [
+        mid for mid, d in matches.items()
+        if (finished is None or (d['status'] == 'Terminé') == finished)
+        and (m_type is None or d.get('type', 'auto') == m_type)
+        and (team is None or team in d['scores'])
+    ]
+
+def matches_table(matches, mids):
+    """Une ligne par match (scores et points de match des matchs terminés)."""
+    import pandas as pd
+    rows = []
+    for mid in mids:
+        d = matches[mid]
+        points = compute_match_points(d['scores']) if d['status'] == 'Terminé' else {}
+        rows.append({
+            "Match": mid,
+            "Libellé": d.get('label', f"Match {mid}"),
+            "Type": "Manuel" if d.get('type') == 'manuel' else "Calendrier",
+            "Tour": d.get('round'),
+            "Statut": d['status'],
+            "Équipes": " vs ".join(d['teams']),
+            "Scores Quiz": " / ".join(str(d['scores'][t]) for t in d['teams']),
+            "Points Match": " / ".join(str(points[t]) for t in d['teams']) if points else "",
+        })
+    return pd.DataFrame(rows, columns=["Match", "Libellé", "Type", "Tour", "Statut", "Équipes", "Scores Quiz", "Points Match"])
+
+# --- MATCHS MANUELS ---
+def validate_manual_teams(selected_teams):
+    """Message d'erreur si la sélection d'équipes est invalide, sinon None."""
+    if len(selected_teams) < 2 or len(selected_teams) > 3:
+        return "Sélectionnez 2 ou 3 équipes pour le match."
+    if len(set(selected_teams)) != len(selected_teams):
+        return "Chaque équipe ne peut apparaître qu'une seule fois."
+    return None
+
+def new_manual_match(teams, label, counter):
+    """Match manuel n°`counter` (libellé par défaut si `label` est vide)."""
+    return {
+        'teams': list(teams),
+        'scores': {t: 0 for t in teams},
+        'status': 'Prévu',
+        'type': 'manuel',
+        'label': label or f"Match Manuel {counter}"
+    }
+
+# --- FORMAT DE SAUVEGARDE ---
+def state_to_dict(refs):
+    """Convertit l'état (équipes et questions en DataFrame) au format de sauvegarde JSON."""
+    state = dict(refs)
+    state["teams"] = refs["teams"].to_dict(orient='records')
+    state["questions"] = refs["questions"].to_dict(orient='records')
+    return state
+
+def state_to_json(refs, indent=4):
+    return json.dumps(state_to_dict(refs), indent=indent)
+
+# Format compact : JSON compressé (gzip), équipes et questions stockées par colonnes
+# sous leur empreinte ; une sauvegarde différentielle ne contient que ce qui a changé
+# depuis une sauvegarde complète, identifiée par l'empreinte de son fichier.
+SAVE_FORMAT = "tournoi"
+SAVE_VERSION = 2
+_SAVE_TABLES = ("teams", "questions")
+
+class SaveError(ValueError):
+    """Sauvegarde illisible ou incohérente avec la sauvegarde complète fournie."""
+
+def _canonical(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode("utf-8")
+
+def table_blob(df):
+    """Table en colonnes + lignes (valeurs manquantes → null) et son empreinte de contenu."""
+    blob = {"columns": list(df.columns), "rows": df.astype(object).where(df.notna(), None).values.tolist()}
+    return hashlib.sha256(_canonical(blob)).hexdigest(), blob
+
+def save_id(data):
+    """Empreinte d'un fichier de sauvegarde (référence des sauvegardes différentielles)."""
+    return hashlib.sha256(data).hexdigest()[:16]
+
+def _pack(payload):
+    # mtime=0 : même contenu, mêmes octets, même empreinte
+    return gzip.compress(_canonical(payload), compresslevel=6, mtime=0)
+
+def _unpack(data):
+    return json.loads(gzip.decompress(data) if data[:2] == b"\x1f\x8b" else data)
+
+def encode_save(refs, base=None, blobs=None, saved_at=None):
+    """
+    Sauvegarde compressée de l'état. Sans `base`, ou si les équipes ou les questions
+    ont changé depuis, sauvegarde complète ; sinon différentielle par rapport à `base`
+    (état lu par decode_save d'une sauvegarde complète). `blobs` évite de recalculer
+    les tables déjà connues ({"teams": (empreinte, table), ...}) ; `saved_at` (texte
+    ISO) départage plusieurs différentielles d'une même sauvegarde complète.
+    Retourne (octets, "full" | "delta").
+    """
+    blobs = blobs or {key: table_blob(refs[key]) for key in _SAVE_TABLES}
+    hashes = {key: blobs[key][0] for key in _SAVE_TABLES}
+    header = {"format": SAVE_FORMAT, "version": SAVE_VERSION, **hashes}
+    rest = {k: refs[k] for k in ("matches", "player_scores", "match_progress", "manual_match_counter")}
+
+    if base is None or any(base["save"][key] != hashes[key] for key in _SAVE_TABLES):
+        payload = {**header, "kind": "full", "blobs": {h: blobs[k][1] for k, h in hashes.items()}, **rest}
+        return _pack(payload), "full"
+
+    def changed(name):
+        old = base[name]
+        return {k: v for k, v in rest[name].items() if old.get(k) != v}
+    payload = {
+        **header, "kind": "delta", "base": base["save"]["id"], "saved_at": saved_at,
+        "matches": changed("matches"), "match_progress": changed("match_progress"),
+        "player_scores": changed("player_scores"),
+        "deleted": [mid for mid in base["matches"] if mid not in rest["matches"]],
+        "manual_match_counter": rest["manual_match_counter"],
+    }
+    return _pack(payload), "delta"
+
+def decode_save(data, base=None):
+    """
+    Lit une sauvegarde : JSON historique, complète ou différentielle (qui exige
+    l'état `base` de sa sauvegarde complète). Les équipes et questions sont
+    rendues en DataFrame construits directement depuis les colonnes.
+    """
+    return _decode_payload(_unpack(data), save_id(data), base)
+
+def _decode_payload(payload, data_id, base):
+    import pandas as pd
+    if payload.get("format") != SAVE_FORMAT:
+        return payload  # ancien format : état JSON complet
+    if payload["version"] > SAVE_VERSION:
+        raise SaveError(f"Format de sauvegarde v{payload['version']} trop récent pour cette version de l'application.")
+
+    if payload["kind"] == "full":
+        state = {k: payload[k] for k in ("matches", "player_scores", "match_progress", "manual_match_counter")}
+        for key in _SAVE_TABLES:
+            blob = payload["blobs"][payload[key]]
+            state[key] = pd.DataFrame(blob["rows"], columns=blob["columns"])
+        state["save"] = {"id": data_id, "kind": "full", **{key: payload[key] for key in _SAVE_TABLES}}
+        return state
+
+    if base is None or base.get("save", {}).get("id") != payload["base"]:
+        raise SaveError("Sauvegarde différentielle : joindre la sauvegarde complète dont elle dépend.")
+    state = {
+        "teams": base["teams"], "questions": base["questions"],
+        # copies : l'état restauré sera modifié sur place, pas la base
+        "matches": {mid: copy.deepcopy(m) for mid, m in base["matches"].items() if mid not in payload["deleted"]},
+        "match_progress": {mid: dict(p) for mid, p in base["match_progress"].items() if mid not in payload["deleted"]},
+        "player_scores": {**base["player_scores"], **payload["player_scores"]},
+        "manual_match_counter": payload["manual_match_counter"],
+        "save": {**base["save"], "kind": "delta"},
+    }
+    state["matches"].update(payload["matches"])
+    state["match_progress"].update(payload["match_progress"])
+    return state
+
+def decode_saves(files):
+    """
+    Restaure un état depuis plusieurs fichiers : une sauvegarde complète (ou un JSON
+    historique) et éventuellement des différentielles ; la plus récente s'applique.
+    """
+    full, deltas = None, []
+    for data in files:
+        payload = _unpack(data)
+        if payload.get("kind") == "delta":
+            deltas.append(payload)
+        elif full is not None:
+            raise SaveError("Une seule sauvegarde complète à la fois.")
+        else:
+            full = _decode_payload(payload, save_id(data), None)
+    if full is None:
+        raise SaveError("Sauvegarde complète manquante.")
+    if not deltas:
+        return full
+    latest = max(deltas, key=lambda p: p.get("saved_at") or "")
+    return _decode_payload(latest, None, full)
+
+def apply_event(state, event):
+    """Rejoue un événement du journal sur un état au format de sauvegarde."""
+    kind, mid = event["type"], event.get("mid")
+    if kind == "award":
+        state["matches"][mid]["scores"][event["team"]] += event["pts"]
+        state["player_scores"][event["player"]] = state["player_scores"].get(event["player"], 0) + event["pts"]
+        if "awards" in state:
+            # les anciens journaux ne notent pas la question : celle du match au moment du rejeu
+            q_idx = event.get("q_idx", state["match_progress"].get(mid, {}).get("q_idx", 0))
+            state["awards"].append([event["seq"], mid, q_idx, event["team"], event["player"], event["pts"]])
+    elif kind == "close":
+        state["matches"][mid]["status"] = "Terminé"
+    elif kind == "next":
+        state["match_progress"].setdefault(mid, {"q_idx": 0})["q_idx"] += 1
+    elif kind == "create":
+        state["matches"][mid] = event["match"]
+        state["match_progress"][mid] = {"q_idx": 0}
+        state["manual_match_counter"] = event["counter"]
+    elif kind == "delete":
+        state["matches"].pop(mid, None)
+        state["match_progress"].pop(mid, None)
+        if "awards" in state:
+            state["awards"] = [a for a in state["awards"] if a[1] != mid]
+
+# --- EXPORTS DES RÉSULTATS ---
+# Une table exportée est (colonnes, types, lignes) : types 'int', 'float' ou 'str'
+# (schéma Parquet) ; les lignes sont un itérable parcouru une seule fois, pendant
+# l'écriture, pour que les grands tournois ne soient jamais chargés d'un bloc.
+EXPORT_CHUNK = 50_000
+MAX_MATCH_TEAMS = 3
+
+def _frame_table(df, rank=True):
+    kinds = ['int' if dt.kind in 'iu' else 'float' if dt.kind == 'f' else 'str' for dt in df.dtypes]
+    rows = df.itertuples(index=False)
+    if rank:
+        return ['Rang', *df.columns], ['int', *kinds], ((i, *row) for i, row in enumerate(rows, start=1))
+    return list(df.columns), kinds, rows
+
+def _match_rows(matches, match_progress, bank):
+    for mid, d in matches.items():
+        points = compute_match_points(d['scores']) if d['status'] == 'Terminé' else {}
+        q_idx = match_progress.get(mid, {}).get('q_idx', 0)
+        asked = min(q_idx + 1 if d['status'] == 'Terminé' else q_idx, deck_length(bank, d.get('deck')))
+        row = [mid, d.get('label', f"Match {mid}"), "Manuel" if d.get('type') == 'manuel' else "Calendrier",
+               d.get('round'), d['status'], asked]
+        for t in d['teams'][:MAX_MATCH_TEAMS]:
+            row += [t, d['scores'][t], points.get(t)]
+        yield row + [None] * (3 * (MAX_MATCH_TEAMS - min(len(d['teams']), MAX_MATCH_TEAMS)))
+
+def _award_rows(awards, matches, roster, bank):
+    for mid, q_idx, team, player, pts in awards:
+        d = matches.get(mid, {})
+        pos = deck_position(bank, d.get('deck'), q_idx)
+        q = bank_question(bank, pos) if pos is not None else {}
+        yield [mid, d.get('label', f"Match {mid}"), q_idx + 1, q.get('Manche'), q.get('Rubrique'), q.get('Question'),
+               q.get('Points'), team, roster['player_name'].get(player, player), pts]
+
+def export_tables(state, roster, bank, awards):
+    """
+    Classements équipes et joueurs, détail des matchs et points attribués question
+    par question. `awards` : itérable de (match, question, équipe, joueur, points),
+    typiquement un curseur SQLite lu au fil de l'écriture.
+    """
+    standings = compute_standings(roster['teams'], state['matches'], state['player_scores'])
+    df_teams, df_players = standings_tables(standings, roster)
+    match_cols = ['Match', 'Libellé', 'Type', 'Tour', 'Statut', 'Questions posées']
+    for i in range(1, MAX_MATCH_TEAMS + 1):
+        match_cols += [f'Équipe {i}', f'Score {i}', f'Points Match {i}']
+    return {
+        'Équipes': _frame_table(df_teams),
+        'Joueurs': _frame_table(df_players),
+        'Matchs': (match_cols, ['str', 'str', 'str', 'int', 'str', 'int'] + ['str', 'int', 'int'] * MAX_MATCH_TEAMS,
+                   _match_rows(state['matches'], state['match_progress'], bank)),
+        'Points par question': (
+            ['Match', 'Libellé', 'Question n°', 'Manche', 'Rubrique', 'Question', 'Valeur', 'Équipe', 'Joueur', 'Points'],
+            ['str', 'str', 'int', 'str', 'str', 'str', 'int', 'str', 'str', 'int'],
+            _award_rows(awards, state['matches'], roster, bank),
+        ),
+    }
+
+def _file_name(name):
+    return name.lower().replace(' ', '_').replace('é', 'e').replace('°', '')
+
+def write_xlsx(path, tables):
+    """Un onglet par table ; classeur en écriture seule (lignes vidées au fil de l'eau)."""
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    for name, (columns, _, rows) in tables.items():
+        ws = wb.create_sheet(name[:31])
+        ws.append(columns)
+        for row in rows:
+            ws.append(list(row))
+    wb.save(path)
+
+def write_csv_zip(path, tables):
+    """Archive ZIP d'un CSV par table (séparateur « ; », UTF-8 avec BOM pour Excel)."""
+    import csv
+    import zipfile
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, (columns, _, rows) in tables.items():
+            with zf.open(f"{_file_name(name)}.csv", 'w') as raw, \
+                    io.TextIOWrapper(raw, encoding='utf-8-sig', newline='') as f:
+                writer = csv.writer(f, delimiter=';')
+                writer.writerow(columns)
+                writer.writerows(rows)
+
+def write_parquet_zip(path, tables, chunk=EXPORT_CHUNK):
+    """Archive ZIP d'un fichier Parquet par table, écrit par groupes de `chunk` lignes."""
+    import zipfile
+    from itertools import islice
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    types = {'int': pa.int64(), 'float': pa.float64(), 'str': pa.string()}
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as zf:
+        for name, (columns, kinds, rows) in tables.items():
+            schema = pa.schema([(c, types[k]) for c, k in zip(columns, kinds)])
+            rows = iter(rows)
+            with zf.open(f"{_file_name(name)}.parquet", 'w') as f, pq.ParquetWriter(f, schema) as writer:
+                while True:
+                    batch = list(islice(rows, chunk))
+                    cols = list(zip(*batch)) if batch else [()] * len(columns)
+                    writer.write_table(pa.Table.from_arrays([
+                        pa.array([str(v) if k == 'str' and v is not None else v for v in col], type=types[k])
+                        for col, k in zip(cols, kinds)
+                    ], schema=schema))
+                    if len(batch) < chunk:
+                        break